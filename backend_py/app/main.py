@@ -12,6 +12,7 @@ from .routes.recommend_positions import router as recommend_positions_router
 from .routes.proxy import router as proxy_router
 from .routes.tips import router as tips_router
 from .routes.tryon_video import router as tryon_video_router
+from .services.vertex_video_service import vertex_video_service
 from .routes.evaluate import router as evaluate_router
 from .routes.search import router as search_router
 from fastapi.middleware.cors import CORSMiddleware
@@ -30,6 +31,7 @@ async def lifespan(app: FastAPI):
     logger.info("Application startup completed")
     yield
     # Shutdown
+    await vertex_video_service.aclose()
     logger.info("Application shutdown")
 
 app = FastAPI(title="AI Virtual Try-On API (Python)", version="1.0.0", lifespan=lifespan)
@@ -31,15 +31,17 @@ def _load_text_index() -> Tuple[Optional[np.ndarray], List[str]]:
         ids_path = root / "data" / "text_ids.json"
         if not emb_path.exists() or not ids_path.exists():
             return None, []
-        embs = np.load(str(emb_path))  # shape: (N, D)
-        # L2 normalize for cosine similarity
-        norms = np.linalg.norm(embs, axis=1, keepdims=True) + 1e-8
-        embs = embs / norms
+        # C-contiguous float32 so the per-query matvec dispatches to BLAS sgemv
+        embs = np.ascontiguousarray(np.load(str(emb_path)), dtype=np.float32)  # shape: (N, D)
+        # L2 normalize once, in place, for cosine similarity
+        norms = np.linalg.norm(embs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embs /= norms
         ids: List[str] = json.loads(ids_path.read_text(encoding="utf-8"))
         if len(ids) != embs.shape[0]:
             # Mismatch; ignore embeddings
             return None, []
-        return embs.astype(np.float32), ids
+        return embs, ids
     except Exception:
         return None, []
 
@@ -118,10 +120,11 @@ def semantic_search(
             embs_view = embs
             ids_view = ids
 
-        # cosine similarity = q dot v (after L2 normalize)
-        sims = embs_view @ q_vec.reshape(-1, 1)  # (N,1)
-        top_k = int(min(limit * 4, sims.shape[0]))
-        idx = np.argpartition(-sims.squeeze(1), top_k - 1)[:top_k]
+        # cosine similarity = q dot v (after L2 normalize); matrix @ vector -> sgemv
+        sims = embs_view @ q_vec  # (N,)
+        n = sims.shape[0]
+        top_k = int(min(limit * 4, n))
+        idx = np.argpartition(sims, n - top_k)[n - top_k:]
         top_pairs = sorted(((float(sims[i]), ids_view[i]) for i in idx), reverse=True)
         results: List[Dict] = []
         for _score, pid in top_pairs:
@@ -1,13 +1,16 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import base64
 import binascii
-from typing import Any, Dict, Optional, Literal, List
+from typing import Any, Dict, Optional, Literal, List, Tuple
 
-from fastapi import APIRouter, HTTPException, Response, Query
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field, conint, constr
 
-from ..services.vertex_video_service import _extract_base64, vertex_video_service
+from ..services.vertex_video_service import _dumps, _extract_base64, vertex_video_service
 
 
 router = APIRouter(prefix="/api/try-on/video", tags=["VirtualTryOnVideo"])
@@ -48,16 +51,23 @@ def _validate_base64_payload(raw: str) -> None:
         raise HTTPException(status_code=400, detail="imageData must be valid base64") from exc
 
 
-@router.post("", summary="Start Vertex AI video generation")
-def start_video_generation(payload: VideoGenerationRequest) -> Dict[str, Any]:
-    base64_data, mime = _extract_base64(payload.imageData, payload.mimeType or "image/png")
+def _prepare_image(image_data: str, fallback_mime: str) -> Tuple[str, str]:
+    # 수 MB base64 디코드 검증은 CPU 작업이라 이벤트 루프 밖(스레드)에서 실행
+    base64_data, mime = _extract_base64(image_data, fallback_mime)
     _validate_base64_payload(base64_data)
+    return base64_data, mime
+
 
-    response = vertex_video_service.start_generation(
+@router.post("", summary="Start Vertex AI video generation")
+async def start_video_generation(payload: VideoGenerationRequest) -> Dict[str, Any]:
+    base64_data, mime = await asyncio.to_thread(_prepare_image, payload.imageData, payload.mimeType or "image/png")
+
+    response = await vertex_video_service.astart_generation(
         prompt=payload.prompt,
         image_data=base64_data,
         mime_type=mime,
         parameters=payload.parameters.to_vertex_params(),
+        trusted_parameters=True,
     )
     operation_name = response.get("name") or response.get("operation", {}).get("name")
     if not operation_name:
@@ -74,8 +84,14 @@ def start_video_generation(payload: VideoGenerationRequest) -> Dict[str, Any]:
 
 
 @router.post("/status", summary="Fetch status for Vertex AI video generation job")
-def fetch_video_status(payload: OperationStatusRequest) -> Dict[str, Any]:
-    response = vertex_video_service.fetch_operation(operation_name=payload.operationName)
+async def fetch_video_status(payload: OperationStatusRequest) -> Response:
+    response = await vertex_video_service.afetch_operation(operation_name=payload.operationName)
+    # 완료된 작업은 인라인 base64 영상(수 MB)을 담을 수 있어 가공/JSON 인코딩을 스레드에서 수행
+    body = await asyncio.to_thread(_status_body, response)
+    return Response(content=body, media_type="application/json")
+
+
+def _status_body(response: Dict[str, Any]) -> bytes:
     operation = response.get("operation", response)
     done = bool(operation.get("done", False)) if isinstance(operation, dict) else False
     video_uris = vertex_video_service.collect_video_uris(response)
@@ -99,17 +115,29 @@ def fetch_video_status(payload: OperationStatusRequest) -> Dict[str, Any]:
     if isinstance(metadata, dict):
         progress = metadata.get("progressPercent") or metadata.get("progress_percent")
 
-    return {
+    return _dumps({
         "done": done,
         "videoUris": video_uris,
         "videoDataUris": inline_data_uris,
         "operation": operation,
         "progressPercent": progress,
-    }
+    })
 
 
 @router.get("/stream", summary="Stream video by proxy (supports gs:// and http(s))")
 def stream_video(uri: str = Query(..., description="gs:// or http(s) video URI")):
     resp = vertex_video_service.open_uri_stream(uri)
     media_type = resp.headers.get("Content-Type", "application/octet-stream")
-    return Response(content=resp.content, media_type=media_type)
+    headers = {}
+    if "Content-Length" in resp.headers and "Content-Encoding" not in resp.headers:
+        headers["Content-Length"] = resp.headers["Content-Length"]
+
+    def relay():
+        # 64 KB 청크로 그대로 중계 (영상 전체를 메모리에 올리지 않음)
+        yield from resp.iter_bytes(chunk_size=64 * 1024)
+
+    # 업스트림 연결 반납은 background에서: 클라이언트가 먼저 끊거나 제너레이터가 한 번도
+    # 시작되지 않아도 응답 처리 후 항상 실행됨 (close()는 여러 번 호출해도 안전)
+    return StreamingResponse(
+        relay(), media_type=media_type, headers=headers, background=BackgroundTask(resp.close)
+    )
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import atexit
+import json
 import logging
+import math
 import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import re
+import select
+import struct
 
 # Robust gender detectors (English word-boundary safe; Korean keyword safe)
 RE_UNISEX = re.compile(r"(?:\buni(?:sex)?\b|男女|공용|유니섹스|남녀|남여|공용/유니섹스|all\s*genders?)", re.I)
@@ -23,6 +33,284 @@ except Exception:  # Optional dependency
     class Engine:  # type: ignore
         pass
 
+try:
+    from scipy.linalg.blas import sgemv as _sgemv  # type: ignore
+except Exception:  # Optional dependency
+    _sgemv = None  # type: ignore
+
+
+def _matvec(mat: np.ndarray, vec: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """(N, D) float32 행렬 x (D,) 벡터. scipy가 있으면 SGEMV를 직접 호출. out이 있으면 그 버퍼에 기록."""
+    if _sgemv is not None and mat.dtype == np.float32 and mat.flags.c_contiguous:
+        # C-contiguous (N, D)의 전치는 Fortran-contiguous (D, N) 이므로 trans=1로 넘기면 복사 없이 계산됨
+        if out is not None:
+            return _sgemv(1.0, mat.T, vec.astype(np.float32, copy=False), beta=0.0, y=out, overwrite_y=1, trans=1)
+        return _sgemv(1.0, mat.T, vec.astype(np.float32, copy=False), trans=1)
+    return np.matmul(mat, vec, out=out)
+
+
+try:
+    from numba import njit, prange, types as nb_types  # type: ignore
+except Exception:  # Optional dependency
+    njit = None  # type: ignore
+    prange = range  # type: ignore
+
+if njit is not None:
+    _f32_1d = nb_types.float32[::1]
+    _f64 = nb_types.float64
+    # Eagerly compiled (explicit signatures, cached on disk) fused cosine + price kernel:
+    # one pass over emb_norm with no N-sized temporaries for sim/price_score.
+    # emb_norm is writable when private, read-only when it is a shared-memory view or mmap.
+    @njit(
+        [
+            nb_types.void(nb_types.float32[:, ::1], _f32_1d, _f32_1d, _f64, _f64, _f64, _f64, _f32_1d),
+            nb_types.void(
+                nb_types.Array(nb_types.float32, 2, "C", readonly=True),
+                _f32_1d, _f32_1d, _f64, _f64, _f64, _f64, _f32_1d,
+            ),
+        ],
+        parallel=True,
+        fastmath=True,
+        cache=True,
+    )
+    def _fused_score_kernel(emb_norm, q, clog, qlog, alpha, w1, w2, out):  # pragma: no cover - numba only
+        n, d = emb_norm.shape
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += emb_norm[i, j] * q[j]
+            out[i] = w1 * acc + w2 * math.exp(-alpha * abs(clog[i] - qlog))
+else:
+    _fused_score_kernel = None  # type: ignore
+
+try:
+    import hnswlib  # type: ignore
+except Exception:  # Optional dependency
+    hnswlib = None  # type: ignore
+
+# DB_RECO_GPU=1: keep emb_norm resident on CUDA as float16 and run the similarity matvec there.
+# torch is only imported when enabled (it is heavy and not a backend requirement).
+torch = None  # type: ignore
+if os.getenv("DB_RECO_GPU", "0").strip().lower() in {"1", "true", "on", "yes"}:
+    try:
+        import torch  # type: ignore
+    except Exception:  # Optional dependency
+        torch = None  # type: ignore
+
+
+def _to_gpu(emb_norm: np.ndarray, logger: logging.Logger):
+    """float16 CUDA copy of emb_norm, or None (no torch/CUDA, or out of GPU memory)."""
+    if torch is None or not torch.cuda.is_available():
+        return None
+    try:
+        with warnings.catch_warnings():
+            # read-only mmap/shared-memory views: torch warns, but the data is only copied to the device
+            warnings.simplefilter("ignore", UserWarning)
+            host = torch.from_numpy(np.asarray(emb_norm))
+        return host.to("cuda", dtype=torch.float16)
+    except Exception as exc:
+        logger.warning("[DbPosRecommender] GPU embeddings unavailable (%s); using CPU", exc)
+        return None
+
+
+def _copy_enabled() -> bool:
+    return os.getenv("DB_EMB_COPY", "1").strip().lower() not in {"0", "false", "off", "no"}
+
+
+_USE_NUMBA = _fused_score_kernel is not None and os.getenv("DB_RECO_NUMBA", "1").strip().lower() not in {"0", "false", "off", "no"}
+
+
+_SHM_HEADER = 64  # bytes before the matrix; byte 0 is set to 1 once the writer has finished,
+_SHM_SHAPE = struct.Struct("<qq")  # and (rows, dim) of the float32 matrix are stored at offset 8
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    try:
+        # 3.13+: don't let this process's resource tracker unlink a block it didn't create
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        # Older Pythons track attached blocks too and would unlink the name when this
+        # process exits; only the creator (or the preload CLI's operator) removes it.
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack_shm(shm)
+        return shm
+
+
+def _untrack_shm(shm: shared_memory.SharedMemory) -> None:
+    # Before 3.13 the resource tracker unlinks every block this process opened when it exits
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+def _unlink_shm(shm: shared_memory.SharedMemory) -> None:
+    try:
+        shm.unlink()
+    except Exception:
+        pass
+
+
+def _release_shm(shm: shared_memory.SharedMemory) -> None:
+    """
+    Drop this handle without unmapping. Arrays built over shm.buf keep a reference to
+    the underlying mmap rather than a buffer export, so shm.close() would succeed and
+    unmap memory an in-flight request is still reading; the mmap is unmapped instead
+    when the last array referencing it is freed.
+    """
+    buf, shm._buf = shm._buf, None  # type: ignore[attr-defined]
+    if buf is not None:
+        buf.release()
+    shm._mmap = None  # type: ignore[attr-defined]
+    fd = getattr(shm, "_fd", -1)
+    if fd >= 0:
+        # the mapping does not need the descriptor
+        os.close(fd)
+        shm._fd = -1  # type: ignore[attr-defined]
+
+
+def _shm_block_name(base: str, version: tuple) -> str:
+    # keyed by the products version (count, max(pos)) so workers can attach before loading embeddings
+    return f"{base}_{version[1]}_{version[0]}"
+
+
+def _attach_shared_matrix(
+    name: str, logger: logging.Logger, wait: float = 30.0
+) -> Tuple[Optional[np.ndarray], Optional[shared_memory.SharedMemory]]:
+    """
+    Attach read-only to a block written by _share_matrix (another worker or the
+    tools/sync_embeddings.py --shm preload), waiting for its writer to finish.
+    Returns (None, None) when the block does not exist or is unusable.
+    """
+    try:
+        shm = _attach_shm(name)
+    except FileNotFoundError:
+        return None, None
+    except Exception as exc:
+        logger.warning("[DbPosRecommender] Cannot attach shared block %s (%s)", name, exc)
+        return None, None
+    deadline = time.monotonic() + wait
+    while shm.buf[0] != 1:
+        if time.monotonic() > deadline:
+            logger.warning("[DbPosRecommender] Timed out waiting for shared block %s", name)
+            shm.close()
+            return None, None
+        time.sleep(0.05)
+    rows, dim = _SHM_SHAPE.unpack_from(shm.buf, 8)
+    if rows < 0 or dim <= 0 or shm.size < _SHM_HEADER + rows * dim * 4:
+        logger.warning("[DbPosRecommender] Shared block %s has unexpected size", name)
+        shm.close()
+        return None, None
+    view = np.ndarray((rows, dim), dtype=np.float32, buffer=shm.buf, offset=_SHM_HEADER)
+    view.flags.writeable = False
+    return view, shm
+
+
+def _share_matrix(
+    name: str, mat: np.ndarray, logger: logging.Logger, wait: float = 30.0, *, persist: bool = False
+) -> Tuple[np.ndarray, Optional[shared_memory.SharedMemory], bool]:
+    """
+    Place a float32 matrix in a named shared-memory block so worker processes hold
+    one physical copy. The first process creates and fills the block, later ones
+    attach read-only. Returns (array, shm, created); on any failure the private
+    matrix is returned with shm=None. A creating process unlinks the name at exit
+    unless `persist` (the preload CLI), in which case the block outlives it.
+    """
+    nbytes = int(mat.nbytes)
+    try:
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_SHM_HEADER + nbytes)
+        except FileExistsError:
+            view, shm = _attach_shared_matrix(name, logger, wait)
+            if view is None or view.shape != mat.shape:
+                if shm is not None:
+                    shm.close()
+                logger.warning("[DbPosRecommender] Shared block %s unusable; using private copy", name)
+                return mat, None, False
+            return view, shm, False
+
+        view = np.ndarray(mat.shape, dtype=np.float32, buffer=shm.buf, offset=_SHM_HEADER)
+        view[:] = mat
+        _SHM_SHAPE.pack_into(shm.buf, 8, *mat.shape)
+        shm.buf[0] = 1
+        if persist:
+            _untrack_shm(shm)
+        else:
+            atexit.register(_unlink_shm, shm)
+        view.flags.writeable = False
+        return view, shm, True
+    except Exception as exc:
+        logger.warning("[DbPosRecommender] Shared memory unavailable (%s); using private copy", exc)
+        return mat, None, False
+
+
+# PostgreSQL binary COPY: 11-byte signature + int32 flags + int32 header-extension length
+_PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_PGCOPY_TRAILER = b"\xff\xff"  # int16 -1 field count ends the stream
+# information_schema data_type -> big-endian wire format of the col_* values
+_PG_FLOAT_WIRE = {"real": ">f4", "double precision": ">f8"}
+
+
+class _CopyMatrixSink:
+    """
+    File-like target for cursor.copy_expert(... TO STDOUT WITH (FORMAT BINARY)).
+    Fixed-width rows (D non-NULL float columns) are decoded in bulk with a
+    structured dtype and written straight into a preallocated float32 matrix,
+    so no per-value Python objects are created.
+    """
+
+    def __init__(self, n_rows: int, dim: int, wire: str, flush_bytes: int = 1 << 20) -> None:
+        width = np.dtype(wire).itemsize
+        self.row = np.dtype([("nfields", ">i2"), ("cells", [("len", ">i4"), ("val", wire)], (dim,))])
+        self.dim, self.width = dim, width
+        self.mat = np.empty((max(n_rows, 1), dim), dtype=np.float32)
+        self.count = 0
+        self._pending = bytearray()
+        self._body = -1  # offset of the first tuple once the header is parsed
+        self._flush_bytes = flush_bytes
+
+    def write(self, data) -> int:
+        self._pending += data
+        if len(self._pending) >= self._flush_bytes:
+            self._drain()
+        return len(data)
+
+    def _drain(self) -> None:
+        buf = self._pending
+        start = self._body
+        if start < 0:
+            if len(buf) < 19:
+                return
+            if not buf.startswith(_PGCOPY_SIGNATURE):
+                raise ValueError("not a PGCOPY binary stream")
+            start = 19 + int.from_bytes(buf[15:19], "big")
+            if len(buf) < start:
+                return
+            self._body = 0
+        k = (len(buf) - start) // self.row.itemsize
+        if k:
+            recs = np.frombuffer(buf, dtype=self.row, count=k, offset=start)
+            cells = recs["cells"]
+            if (recs["nfields"] != self.dim).any() or (cells["len"] != self.width).any():
+                raise ValueError("unexpected NULL or column layout in embeddings COPY")
+            if self.count + k > self.mat.shape[0]:
+                # Rows inserted after COUNT(*): grow rather than drop them
+                extra = max(k, self.mat.shape[0] // 4)
+                self.mat = np.concatenate([self.mat, np.empty((extra, self.dim), dtype=np.float32)])
+            self.mat[self.count:self.count + k] = cells["val"]
+            self.count += k
+            start += k * self.row.itemsize
+            del recs, cells  # release the buffer export before resizing
+        del buf[:start]
+
+    def finish(self) -> np.ndarray:
+        self._drain()
+        if self._body < 0 or bytes(self._pending) != _PGCOPY_TRAILER:
+            raise ValueError("truncated embeddings COPY stream")
+        return self.mat[: self.count]
+
 
 @dataclass
 class DbConfig:
@@ -47,6 +335,38 @@ class DbConfig:
         )
 
 
+@dataclass(frozen=True)
+class _CatalogState:
+    """
+    Everything one load publishes. _load_all swaps a single instance in, and each
+    request reads self._state once and passes it down, so scoring never mixes
+    arrays from two catalogs even if a background reload lands mid-request.
+    """
+
+    products: List[Dict]
+    emb: Optional[np.ndarray]  # raw matrix; None once emb_norm lives in a snapshot/shared block
+    emb_norm: np.ndarray
+    prices: np.ndarray
+    clog: np.ndarray  # log1p(prices), precomputed at load
+    qlog_mean: float  # log1p(prices.mean()), the per-catalog query price term
+    categories: np.ndarray  # normalized slot per row (parallel to products)
+    ann: object  # optional hnswlib index over emb_norm (USE_ANN=1)
+    emb_gpu: object  # optional float16 CUDA copy of emb_norm (DB_RECO_GPU=1)
+    version: tuple  # (max(pos), count(*)) of the loaded products
+    generation: int  # bumped on every publish; in-place UPDATEs don't change version
+
+
+def _result_item(product: Dict, score: float) -> Dict:
+    """
+    Result dict for one product. Product dicts are flat apart from the "tags" list,
+    so a shallow copy plus a fresh tags list fully detaches the result from the
+    catalog (far cheaper than copy.deepcopy on the hot path).
+    """
+    item = {**product, "score": score}
+    item["tags"] = list(product.get("tags") or ())
+    return item
+
+
 def _normalize_slot(raw: Optional[str]) -> str:
     c = (str(raw or "").strip().lower())
     if not c:
@@ -92,13 +412,6 @@ def _normalize_gender(raw: Optional[str]) -> str:
         return "male"
     return g.lower()
 
-def _parse_price(value: object) -> int:
-    text = str(value or "").strip()
-    if not text:
-        return 0
-    digits = re.sub(r"[^0-9]", "", text)
-    return int(digits) if digits else 0
-
 class DbPosRecommender:
     """
     DB-backed recommender. Loads products and embeddings into memory (NumPy) and
@@ -112,15 +425,30 @@ class DbPosRecommender:
         self.cfg = cfg or DbConfig()
         self.logger = logging.getLogger(__name__)
         self.engine: Optional[Engine] = None
-        self.products: List[Dict] = []
-        self.emb: Optional[np.ndarray] = None
-        self.emb_norm: Optional[np.ndarray] = None
-        self.prices: Optional[np.ndarray] = None
+        # Loaded catalog; replaced as a whole on reload (None until the first successful load)
+        self._state: Optional[_CatalogState] = None
+        # LRU of recommend() results keyed by (version, positions, top_k, alpha, w1, w2); cleared on reload
+        self._rec_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        self._rec_cache_size = int(os.getenv("DB_RECO_CACHE_SIZE", "1024"))
+        self._rec_lock = threading.Lock()
+        # Per-thread N-length float32 work buffers for scoring (handlers run on a thread pool)
+        self._scratch = threading.local()
+        # Optional cross-process emb_norm (DB_RECO_SHM_NAME); a replaced block stays mapped until no view remains
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._shm_created = False
+        # Optional .npy snapshot of emb_norm (tools/sync_embeddings.py), memory-mapped instead of
+        # fetched from the DB when its sidecar version matches the products table
+        self.snapshot_path = os.getenv("DB_EMB_SNAPSHOT", "").strip()
 
         if self.cfg.url and create_engine is not None and text is not None:
             try:
+                # Size the pool to worker concurrency; keep
+                # (DB_POOL_SIZE + DB_MAX_OVERFLOW) * workers <= PG max_connections
                 self.engine = create_engine(
                     self.cfg.url,
+                    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+                    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
                     pool_pre_ping=True,
                     connect_args={
                         # Keep TCP healthy
@@ -142,34 +470,211 @@ class DbPosRecommender:
                     )
                 else:
                     self.logger.warning("[DbPosRecommender] Loaded data but recommender marked unavailable")
+                self._start_refresh_thread()
             except Exception as exc:
                 self.logger.exception("[DbPosRecommender] Initialization failed: %s", exc)
                 # Leave unavailable; route will fall back
                 self.engine = None
 
-    def _load_all(self) -> None:
+    # Read-only views of the current state for callers outside the scoring path
+    @property
+    def products(self) -> List[Dict]:
+        st = self._state
+        return st.products if st is not None else []
+
+    @property
+    def emb_norm(self) -> Optional[np.ndarray]:
+        st = self._state
+        return st.emb_norm if st is not None else None
+
+    @property
+    def categories(self) -> Optional[np.ndarray]:
+        st = self._state
+        return st.categories if st is not None else None
+
+    @property
+    def _version(self) -> Optional[tuple]:
+        st = self._state
+        return st.version if st is not None else None
+
+    def _load_all(self, *, trust_version: bool = True) -> None:
+        """
+        Load products + embeddings and publish them. With trust_version (every load
+        except a NOTIFY-triggered one) embeddings may come from the version-keyed
+        snapshot or shared-memory block instead of the DB.
+        """
         assert self.engine is not None and text is not None
-        # Load products
-        with self.engine.begin() as conn:
-            rows = conn.execute(
-                text(
-                    """
-                    SELECT pos,
-                           "Product_U",
-                           "Product_img_U",
-                           "Product_N",
-                           "Product_Desc",
-                           "Product_P",
-                           "Category",
-                           "Product_B",
-                           "Product_G",
-                           "Image_P"
-                    FROM public.products
-                    ORDER BY pos ASC
-                    """
-                )
-            ).mappings().all()
-        self.products = []
+        # One read-only REPEATABLE READ transaction for every query: a single pool
+        # checkout, and products/embeddings are read from the same snapshot.
+        with self.engine.connect().execution_options(
+            isolation_level="REPEATABLE READ", postgresql_readonly=True
+        ) as conn:
+            conn.execute(
+                text("SELECT set_config('statement_timeout', :t, true)"),
+                {"t": os.getenv("DB_STATEMENT_TIMEOUT", "30s")},
+            )
+            products, prices, categories = self._load_products(conn)
+            version = (max((p["pos"] for p in products), default=None), len(products))
+            shm_base = os.getenv("DB_RECO_SHM_NAME", "").strip()
+            emb_norm = self._load_snapshot(version) if trust_version else None
+            shared: Optional[shared_memory.SharedMemory] = None
+            if emb_norm is None and trust_version and shm_base:
+                # another worker (or the preload CLI) already published this version: attach, skip the fetch
+                emb_norm, shared = _attach_shared_matrix(_shm_block_name(shm_base, version), self.logger)
+            mat = self._load_embeddings(conn) if emb_norm is None else None
+
+        # Sanity check
+        n_rows = emb_norm.shape[0] if emb_norm is not None else mat.shape[0]
+        if len(products) != n_rows:
+            # mismatch: keep current state (unavailable on first load, last good data on refresh)
+            self.logger.error(
+                "[DbPosRecommender] Product/embedding count mismatch: products=%d, embeddings_rows=%d",
+                len(products),
+                n_rows,
+            )
+            return
+
+        emb: Optional[np.ndarray] = None
+        if emb_norm is None:
+            emb = mat.astype(np.float32, copy=False)
+            # einsum fuses square+sum in one pass and skips the np.linalg.norm dispatcher
+            norms = np.sqrt(np.einsum("ij,ij->i", emb, emb))
+            norms[norms == 0] = 1e-8
+            emb_norm = np.ascontiguousarray(emb / norms[:, None], dtype=np.float32)
+        clog = np.log1p(prices).astype(np.float32, copy=False)
+        qlog_mean = float(np.log1p(prices.mean())) if prices.size else 0.0
+        ann = self._build_ann_index(emb_norm)
+        emb_gpu = _to_gpu(emb_norm, self.logger)
+
+        old_shm, old_created = self._shm, self._shm_created
+        if shared is not None:
+            self._shm, self._shm_created = shared, False
+        elif emb is None:
+            # Snapshot mmap: the page cache already holds one physical copy for all workers
+            self._shm, self._shm_created = None, False
+        elif shm_base and not trust_version:
+            # In-place edits keep the version, so the version-keyed block may hold old rows
+            self._shm, self._shm_created = None, False
+        elif shm_base:
+            emb_norm, self._shm, self._shm_created = _share_matrix(
+                _shm_block_name(shm_base, version), emb_norm, self.logger
+            )
+            if self._shm is not None:
+                # The raw matrix is not needed after normalization; don't keep a private N x D copy
+                emb = None
+
+        # Publish everything at once so readers see either the old or the new state
+        old = self._state
+        self._state = _CatalogState(
+            products=products, emb=emb, emb_norm=emb_norm, prices=prices, clog=clog, qlog_mean=qlog_mean,
+            categories=categories, ann=ann, emb_gpu=emb_gpu, version=version,
+            generation=(old.generation + 1) if old is not None else 1,
+        )
+        with self._rec_lock:
+            self._rec_cache.clear()
+        if old_shm is not None and old_shm is not self._shm:
+            self._retire_shm(old_shm, unlink=old_created)
+
+    def _load_snapshot(self, version: tuple) -> Optional[np.ndarray]:
+        """Memory-map the DB_EMB_SNAPSHOT matrix if its sidecar version matches `version`, else None."""
+        path = self.snapshot_path
+        if not path:
+            return None
+        try:
+            with open(path + ".meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != [None if v is None else int(v) for v in version]:
+                self.logger.info("[DbPosRecommender] Embedding snapshot %s is stale; loading from DB", path)
+                return None
+            mat = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            self.logger.info("[DbPosRecommender] Embedding snapshot %s not found; loading from DB", path)
+            return None
+        except (OSError, ValueError) as exc:
+            self.logger.warning("[DbPosRecommender] Embedding snapshot unusable (%s); loading from DB", exc)
+            return None
+        if mat.dtype != np.float32 or mat.ndim != 2 or not mat.flags.c_contiguous:
+            return None
+        self.logger.info("[DbPosRecommender] Memory-mapped embedding snapshot %s %s", path, mat.shape)
+        return mat
+
+    def save_snapshot(self, path: str) -> bool:
+        """
+        Write the loaded emb_norm and its products version to `path` (+ .meta.json)
+        for DB_EMB_SNAPSHOT. The sidecar is removed first and written last, so a
+        concurrently starting worker never pairs a new matrix with an old version.
+        """
+        st = self._state
+        if st is None:
+            return False
+        emb_norm, version = st.emb_norm, st.version
+        meta_path = path + ".meta.json"
+        try:
+            os.remove(meta_path)
+        except FileNotFoundError:
+            pass
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, np.asarray(emb_norm))
+        os.replace(tmp, path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"version": [None if v is None else int(v) for v in version], "shape": list(emb_norm.shape)}, f)
+        return True
+
+    def _retire_shm(self, shm: shared_memory.SharedMemory, *, unlink: bool) -> None:
+        # Unlinking only drops the name; the mapping stays valid until every view is gone
+        if unlink:
+            _unlink_shm(shm)
+        _release_shm(shm)
+
+    def _build_ann_index(self, emb_norm: np.ndarray):
+        """HNSW index for candidate generation; None unless USE_ANN=1 and hnswlib is installed."""
+        if os.getenv("USE_ANN", "").strip().lower() not in {"1", "true", "on", "yes"}:
+            return None
+        if hnswlib is None:
+            self.logger.warning("[DbPosRecommender] USE_ANN=1 but hnswlib is not installed; using exact search")
+            return None
+        n, d = emb_norm.shape
+        if n == 0:
+            return None
+        # Rows are unit-normalized, so inner product == cosine similarity
+        index = hnswlib.Index(space="ip", dim=int(d))
+        index.init_index(
+            max_elements=n,
+            M=int(os.getenv("ANN_M", "32")),
+            ef_construction=int(os.getenv("ANN_EF_CONSTRUCTION", "200")),
+        )
+        index.add_items(emb_norm, np.arange(n))
+        self.logger.info("[DbPosRecommender] Built HNSW index over %d embeddings", n)
+        return index
+
+    def _load_products(self, conn) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        """
+        Load product rows. Price digits are extracted SQL-side (e.g. "12,900원" -> 12900)
+        and prices/categories are also returned as arrays parallel to the product dicts.
+        """
+        assert text is not None
+        rows = conn.execute(
+            text(
+                """
+                SELECT pos,
+                       "Product_U",
+                       "Product_img_U",
+                       "Product_N",
+                       "Product_Desc",
+                       COALESCE(
+                           NULLIF(regexp_replace("Product_P"::text, '[^0-9]', '', 'g'), ''),
+                           '0'
+                       )::bigint AS price,
+                       "Category",
+                       "Product_B",
+                       "Product_G",
+                       "Image_P"
+                FROM public.products
+                ORDER BY pos ASC
+                """
+            )
+        ).mappings().all()
+        products: List[Dict] = []
         for r in rows:
             title = r.get("Product_N") or r.get("Product_Desc") or ""
             brand = r.get("Product_B")
@@ -184,12 +689,12 @@ class DbPosRecommender:
             category_raw = r.get("Category")
             norm_cat = _normalize_slot(category_raw)
             gender_norm = _normalize_gender(gender_raw)
-            self.products.append(
+            products.append(
                 {
                     "id": str(r.get("pos")),
                     "pos": int(r.get("pos")),
                     "title": str(title),
-                    "price": _parse_price(r.get("Product_P")),
+                    "price": r["price"],
                     "tags": tags,
                     "category": norm_cat,
                     "gender": gender_norm,
@@ -197,56 +702,199 @@ class DbPosRecommender:
                     "productUrl": product_url,
                 }
             )
+        prices = np.fromiter((p["price"] for p in products), dtype=np.float32, count=len(products))
+        categories = np.array([p["category"] for p in products], dtype=str)
+        return products, prices, categories
 
-        # Load embeddings (supports col_0.. or value)
-        with self.engine.begin() as conn:
-            cols = [c[0] for c in conn.execute(
-                text(
-                    """
-                    SELECT column_name FROM information_schema.columns
-                    WHERE table_schema='public' AND table_name='embeddings'
-                    ORDER BY ordinal_position
-                    """
-                )
-            ).all()]
+    def _load_embeddings(self, conn) -> np.ndarray:
+        """Load the embedding matrix (supports col_0.. or value)."""
+        assert text is not None
+        col_types = [(c[0], c[1]) for c in conn.execute(
+            text(
+                """
+                SELECT column_name, data_type FROM information_schema.columns
+                WHERE table_schema='public' AND table_name='embeddings'
+                ORDER BY ordinal_position
+                """
+            )
+        ).all()]
 
-        vector_cols = [c for c in cols if c.startswith("col_")]
+        vector_cols = [c for c, _ in col_types if c.startswith("col_")]
+        wire_types = {_PG_FLOAT_WIRE.get(t) for c, t in col_types if c.startswith("col_")}
+        if vector_cols and len(wire_types) == 1 and None not in wire_types and _copy_enabled():
+            try:
+                # SAVEPOINT so a failed COPY doesn't abort the snapshot transaction for the fallback
+                with conn.begin_nested():
+                    return self._copy_embeddings(conn, vector_cols, wire_types.pop())
+            except Exception as exc:
+                self.logger.warning("[DbPosRecommender] Binary COPY of embeddings failed (%s); streaming rows", exc)
         if vector_cols:
-            with self.engine.begin() as conn:
-                col_list = ", ".join(['pos'] + vector_cols)
-                data = conn.execute(text(f"SELECT {col_list} FROM public.embeddings ORDER BY pos ASC")).all()
-            mat = np.array([list(row)[1:] for row in data], dtype=np.float32)
+            col_list = ", ".join(['pos'] + vector_cols)
+            query = f"SELECT {col_list} FROM public.embeddings ORDER BY pos ASC"
         else:
-            with self.engine.begin() as conn:
-                data = conn.execute(text('SELECT pos, "value" FROM public.embeddings ORDER BY pos ASC')).all()
             # Assume DB driver returns Python list/JSON for value
-            mat = np.array([np.array(row[1], dtype=np.float32) for row in data], dtype=np.float32)
+            query = 'SELECT pos, "value" FROM public.embeddings ORDER BY pos ASC'
+        return self._stream_embeddings(conn, query, dim=len(vector_cols) or None)
 
-        # Sanity check
-        if len(self.products) != mat.shape[0]:
-            # mismatch: mark unavailable
-            self.logger.error(
-                "[DbPosRecommender] Product/embedding count mismatch: products=%d, embeddings_rows=%d",
-                len(self.products),
-                mat.shape[0],
+    def _copy_embeddings(self, conn, vector_cols: List[str], wire: str) -> np.ndarray:
+        """
+        COPY the col_* values in binary straight into a float32 matrix
+        (psycopg2 copy_expert on the same connection, so same snapshot).
+        """
+        assert text is not None
+        n_rows = int(conn.execute(text("SELECT COUNT(*) FROM public.embeddings")).scalar() or 0)
+        sink = _CopyMatrixSink(n_rows, len(vector_cols), wire)
+        col_list = ", ".join(f'"{c}"' for c in vector_cols)
+        cur = conn.connection.cursor()
+        try:
+            cur.copy_expert(
+                f"COPY (SELECT {col_list} FROM public.embeddings ORDER BY pos ASC) TO STDOUT WITH (FORMAT BINARY)",
+                sink,
             )
-            self.products = []
-            self.emb = None
-            self.emb_norm = None
-            self.prices = None
+        finally:
+            cur.close()
+        return sink.finish()
+
+    def _stream_embeddings(self, conn, query: str, *, dim: Optional[int]) -> np.ndarray:
+        """
+        Stream embedding rows through a server-side cursor into a preallocated
+        float32 matrix, so peak memory stays at one fetch batch of driver rows
+        instead of the whole result set.
+        """
+        assert text is not None
+        n_rows = int(conn.execute(text("SELECT COUNT(*) FROM public.embeddings")).scalar() or 0)
+        if n_rows == 0:
+            return np.empty((0, dim or 0), dtype=np.float32)
+
+        fetch_size = int(os.getenv("DB_EMB_FETCH_SIZE", "10000"))
+        result = conn.execution_options(stream_results=True, yield_per=fetch_size).execute(text(query))
+        mat: Optional[np.ndarray] = None
+        i = 0
+        for row in result:
+            vec = row[1:] if dim else row[1]
+            if mat is None:
+                mat = np.empty((n_rows, dim or len(vec)), dtype=np.float32)
+            if i >= n_rows:
+                # Rows inserted after COUNT(*): grow rather than drop them
+                mat = np.concatenate([mat, np.empty_like(mat[: max(1, n_rows // 4)])])
+                n_rows = mat.shape[0]
+            mat[i] = vec
+            i += 1
+        if mat is None:
+            return np.empty((0, dim or 0), dtype=np.float32)
+        return mat[:i]
+
+    def _start_refresh_thread(self) -> None:
+        interval = float(os.getenv("DB_RECO_REFRESH_SECONDS", "300"))
+        channel = os.getenv("DB_RECO_NOTIFY_CHANNEL", "").strip()
+        if channel and not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", channel):
+            self.logger.warning("[DbPosRecommender] Ignoring invalid DB_RECO_NOTIFY_CHANNEL %r", channel)
+            channel = ""
+        if (interval <= 0 and not channel) or self.engine is None:
             return
+        threading.Thread(
+            target=self._poll_refresh, args=(interval, channel), name="db-reco-refresh", daemon=True
+        ).start()
+
+    def _listen(self, channel: str):
+        """
+        Dedicated autocommit psycopg2 session LISTENing on `channel` (detached from the
+        pool so it never counts against request connections), or None on failure.
+        Pair it with a statement-level trigger, e.g.
+
+            CREATE FUNCTION notify_products_changed() RETURNS trigger AS $$
+            BEGIN PERFORM pg_notify('products_changed', TG_TABLE_NAME); RETURN NULL; END
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER products_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+                ON public.products FOR EACH STATEMENT EXECUTE FUNCTION notify_products_changed();
+            -- and the same trigger on public.embeddings
+        """
+        try:
+            raw = self.engine.raw_connection()  # type: ignore[union-attr]
+            raw.detach()
+            pg = getattr(raw, "driver_connection", None) or raw.dbapi_connection
+            pg.autocommit = True
+            with pg.cursor() as cur:
+                cur.execute(f'LISTEN "{channel}"')
+            self.logger.info("[DbPosRecommender] Listening for catalog changes on %s", channel)
+            return pg
+        except Exception as exc:
+            self.logger.warning("[DbPosRecommender] LISTEN %s failed (%s); polling only", channel, exc)
+            return None
 
-        self.emb = mat.astype(np.float32, copy=False)
-        norms = np.linalg.norm(self.emb, axis=1)
-        norms[norms == 0] = 1e-8
-        self.emb_norm = self.emb / norms[:, None]
-        self.prices = np.array([p["price"] for p in self.products], dtype=np.float32)
+    @staticmethod
+    def _wait_notify(pg, timeout: Optional[float]) -> bool:
+        """Block up to `timeout` seconds (None = forever) for a NOTIFY; True if one arrived."""
+        if pg.notifies:
+            pg.notifies.clear()
+            return True
+        readable, _, _ = select.select([pg], [], [], timeout)
+        if not readable:
+            return False
+        pg.poll()
+        got = bool(pg.notifies)
+        pg.notifies.clear()
+        return got
+
+    def _poll_refresh(self, interval: float, channel: str = "") -> None:
+        """
+        Stale-while-revalidate: reload in the background while requests keep using
+        the previously published arrays. With DB_RECO_NOTIFY_CHANNEL a NOTIFY
+        triggers the reload right away (bursts are coalesced over
+        DB_RECO_NOTIFY_DEBOUNCE seconds); the (max(pos), count(*)) poll every
+        `interval` seconds remains as a fallback.
+        """
+        debounce = float(os.getenv("DB_RECO_NOTIFY_DEBOUNCE", "1.0"))
+        listener = None
+        while self.engine is not None:
+            if channel and listener is None:
+                listener = self._listen(channel)
+            if listener is None:
+                time.sleep(interval if interval > 0 else 30.0)
+                if interval <= 0:
+                    continue  # notify-only mode: just retry LISTEN
+            else:
+                try:
+                    notified = self._wait_notify(listener, interval if interval > 0 else None)
+                    if notified:
+                        # many row-level writes -> one reload; cap the wait so constant writes can't starve it
+                        deadline = time.monotonic() + debounce * 10
+                        while time.monotonic() < deadline and self._wait_notify(listener, debounce):
+                            pass
+                except Exception as exc:
+                    self.logger.warning("[DbPosRecommender] LISTEN connection lost (%s); reconnecting", exc)
+                    try:
+                        listener.close()
+                    except Exception:
+                        pass
+                    listener = None
+                    continue
+                if notified:
+                    try:
+                        self.logger.info("[DbPosRecommender] Catalog change notified, reloading")
+                        # in-place UPDATEs keep (max(pos), count) so the snapshot can't be trusted here
+                        self._load_all(trust_version=False)
+                    except Exception as exc:
+                        self.logger.warning("[DbPosRecommender] Background refresh failed: %s", exc)
+                    continue
+            try:
+                with self.engine.connect() as conn:
+                    row = conn.execute(text("SELECT max(pos), count(*) FROM public.products")).one()
+                version = (row[0], int(row[1]))
+                if version == self._version:
+                    continue
+                self.logger.info("[DbPosRecommender] Products changed %s -> %s, reloading", self._version, version)
+                self._load_all()
+            except Exception as exc:
+                self.logger.warning("[DbPosRecommender] Background refresh failed: %s", exc)
 
     def available(self) -> bool:
-        return self.emb_norm is not None and len(self.products) > 0
+        st = self._state
+        return st is not None and len(st.products) > 0
 
     def _calculate_similarity_scores(
         self,
+        st: _CatalogState,
         query_vec: np.ndarray,
         *,
         alpha: float = 0.38,
@@ -257,6 +905,7 @@ class DbPosRecommender:
         코사인 유사도 + 가격 가중치 계산 공통 함수
 
         Args:
+            st: 요청 시작 시 읽은 카탈로그 상태
             query_vec: 정규화된 쿼리 벡터
             alpha: 가격 가중치 파라미터
             w1: 유사도 가중치
@@ -265,23 +914,58 @@ class DbPosRecommender:
         Returns:
             np.ndarray: 최종 점수 배열
         """
-        emb_norm = self.emb_norm  # type: ignore[assignment]
-        prices = self.prices  # type: ignore[assignment]
+        emb_norm = st.emb_norm
+        clog = st.clog
+        qlog = st.qlog_mean  # 로드 시 계산 (요청마다 N개 평균을 다시 구하지 않음)
+        sim, price_score, total = self._scratch_buffers(emb_norm.shape[0])
+        emb_gpu = st.emb_gpu
 
-        # 코사인 유사도 계산
-        sim = emb_norm @ query_vec
+        if emb_gpu is not None and emb_gpu.shape[0] == emb_norm.shape[0]:
+            # CUDA float16 matvec; the result is copied straight into the host sim buffer
+            q = torch.from_numpy(np.ascontiguousarray(query_vec, dtype=np.float32))
+            q = q.to(emb_gpu.device, dtype=torch.float16)
+            torch.from_numpy(sim).copy_(emb_gpu @ q)
+        elif _USE_NUMBA:
+            _fused_score_kernel(
+                emb_norm,
+                np.ascontiguousarray(query_vec, dtype=np.float32),
+                clog,
+                float(qlog),
+                float(alpha),
+                float(w1),
+                float(w2),
+                total,
+            )
+            return total
+        else:
+            # 코사인 유사도 계산
+            sim = _matvec(emb_norm, np.ascontiguousarray(query_vec, dtype=np.float32), out=sim)
 
-        # 가격 가중치 계산
-        avg_price = float(prices.mean())
-        clog = np.log1p(prices)
-        qlog = np.log1p(avg_price)
-        price_score = np.exp(-alpha * np.abs(clog - qlog))
+        # 가격 가중치 계산: exp(-alpha * |clog - qlog|)
+        np.subtract(clog, qlog, out=price_score)
+        np.abs(price_score, out=price_score)
+        price_score *= -alpha
+        np.exp(price_score, out=price_score)
 
-        # 최종 점수 계산
-        total = w1 * sim + w2 * price_score
+        # 최종 점수 계산: w1 * sim + w2 * price_score
+        np.multiply(sim, w1, out=total)
+        price_score *= w2
+        total += price_score
 
         return total
 
+    def _scratch_buffers(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Reusable (sim, price_score, total) buffers for the calling thread.
+        The returned total is only valid until the same thread scores again.
+        """
+        s = self._scratch
+        bufs = getattr(s, "bufs", None)
+        if bufs is None or bufs[0].shape[0] != n:
+            bufs = tuple(np.empty(n, dtype=np.float32) for _ in range(3))
+            s.bufs = bufs
+        return bufs  # type: ignore[return-value]
+
     def recommend(
         self,
         positions: List[int],
@@ -291,39 +975,104 @@ class DbPosRecommender:
         w1: float = 0.97,
         w2: float = 0.03,
     ) -> List[Dict]:
-        if not self.available():
+        # Snapshot once; the background refresher may publish new state mid-call
+        st = self._state
+        if st is None or not st.products:
             raise RuntimeError("DbPosRecommender unavailable")
 
-        n = len(self.products)
+        if self._rec_cache_size <= 0:
+            return self._recommend(st, positions, top_k=top_k, alpha=alpha, w1=w1, w2=w2)
+
+        # version/generation in the key keep a result computed from an old state from being served afterwards
+        key = (
+            st.version, st.generation,
+            tuple(sorted(positions)), int(top_k), round(alpha, 4), round(w1, 4), round(w2, 4),
+        )
+        with self._rec_lock:
+            cached = self._rec_cache.get(key)
+            if cached is not None:
+                self._rec_cache.move_to_end(key)
+        if cached is None:
+            cached = self._recommend(st, positions, top_k=top_k, alpha=alpha, w1=w1, w2=w2)
+            with self._rec_lock:
+                self._rec_cache[key] = cached
+                if len(self._rec_cache) > self._rec_cache_size:
+                    self._rec_cache.popitem(last=False)
+        # callers may mutate the items; never hand out the cached objects
+        return [_result_item(p, p["score"]) for p in cached]
+
+    def _recommend(
+        self,
+        st: _CatalogState,
+        positions: List[int],
+        *,
+        top_k: int,
+        alpha: float,
+        w1: float,
+        w2: float,
+    ) -> List[Dict]:
+        products = st.products
+        emb_norm = st.emb_norm
+        ann = st.ann
+        n = len(products)
+        if not positions:
+            raise ValueError("positions must not be empty")
         if any(p < 0 or p >= n for p in positions):
             raise ValueError("positions out of range")
 
         k = max(1, min(int(top_k), n))
-        emb_norm = self.emb_norm  # type: ignore[assignment]
 
         # 쿼리 벡터 생성 및 정규화
-        q = emb_norm[positions].mean(axis=0)
-        qn = np.linalg.norm(q)
+        # (팬시 인덱싱 emb_norm[positions]는 |positions|xD 임시 배열을 만들므로 행 단위로 누적)
+        q = emb_norm[positions[0]].copy()
+        for p in positions[1:]:
+            q += emb_norm[p]
+        q /= len(positions)
+        qn = math.sqrt(float(np.vdot(q, q)))
         if qn == 0:
             qn = 1e-8
         q = q / qn
 
-        # 공통 함수로 점수 계산
-        total = self._calculate_similarity_scores(q, alpha=alpha, w1=w1, w2=w2)
-        total[np.array(positions, dtype=int)] = -np.inf
-
-        if k >= n:
-            top_idx = np.argsort(-total)
+        if ann is not None and k < n:
+            # 2단계: ANN 후보 추출 -> 후보만 정확한 코사인 + 가격 점수로 재정렬
+            n_cands = min(n, max(k * 40, 200) + len(positions))
+            ann.set_ef(max(n_cands, 50))
+            labels, _ = ann.knn_query(q, k=n_cands)
+            cands = labels[0].astype(np.int64)
+            cands = cands[~np.isin(cands, positions)]
+            scores = self._score_candidates(st, q, cands, alpha=alpha, w1=w1, w2=w2)
+            order = np.argsort(-scores)[:k]
+            top_idx = cands[order]
+            top_scores = scores[order]
         else:
-            part = np.argpartition(-total, kth=k - 1)[:k]
-            top_idx = part[np.argsort(-total[part])]
+            # 공통 함수로 점수 계산
+            total = self._calculate_similarity_scores(st, q, alpha=alpha, w1=w1, w2=w2)
+            total[np.array(positions, dtype=int)] = -np.inf
+
+            if k >= n:
+                top_idx = np.argsort(-total)
+            else:
+                # k largest land at the tail; no negated N-length copy of total
+                part = np.argpartition(total, n - k)[n - k:]
+                top_idx = part[np.argsort(-total[part])]
+            top_scores = total[top_idx]
 
-        out: List[Dict] = []
-        for i in top_idx.tolist():
-            p = dict(self.products[i])
-            p["score"] = float(total[i])
-            out.append(p)
-        return out
+        return [_result_item(products[i], score) for i, score in zip(top_idx.tolist(), top_scores.tolist())]
+
+    def _score_candidates(
+        self,
+        st: _CatalogState,
+        query_vec: np.ndarray,
+        cands: np.ndarray,
+        *,
+        alpha: float,
+        w1: float,
+        w2: float,
+    ) -> np.ndarray:
+        """_calculate_similarity_scores와 같은 점수를 후보 인덱스에 대해서만 계산"""
+        sim = st.emb_norm[cands] @ query_vec
+        price_score = np.exp(-alpha * np.abs(st.clog[cands] - st.qlog_mean))
+        return w1 * sim + w2 * price_score
 
     def recommend_by_embedding(
         self,
@@ -349,55 +1098,49 @@ class DbPosRecommender:
         Returns:
             List[Dict]: 추천 아이템 리스트
         """
-        if not self.available():
+        # Snapshot once; the background refresher may publish new state mid-call
+        st = self._state
+        if st is None or not st.products:
             raise RuntimeError("DbPosRecommender unavailable")
 
-        n = len(self.products)
+        products = st.products
+        categories = st.categories
+        n = len(products)
         k = max(1, min(int(top_k), n))
 
         # 쿼리 벡터 정규화
         query_vec = np.array(query_embedding, dtype=np.float32)
-        query_norm = np.linalg.norm(query_vec)
+        query_norm = math.sqrt(float(np.vdot(query_vec, query_vec)))
         if query_norm == 0:
             query_norm = 1e-8
         query_vec = query_vec / query_norm
 
         # 공통 함수로 점수 계산
-        total = self._calculate_similarity_scores(query_vec, alpha=alpha, w1=w1, w2=w2)
+        total = self._calculate_similarity_scores(st, query_vec, alpha=alpha, w1=w1, w2=w2)
 
         # 카테고리 필터링
         if category:
-            category_indices = []
-            for i, product in enumerate(self.products):
-                product_category = _normalize_slot(product.get("category", ""))
-                if product_category == category:
-                    category_indices.append(i)
-
-            if not category_indices:
+            mask = categories == category
+            if not mask.any():
                 return []
 
-            # 카테고리 필터링된 인덱스로 점수 재계산
-            filtered_total = np.full(n, -np.inf)
-            for idx in category_indices:
-                filtered_total[idx] = total[idx]
-            total = filtered_total
+            # 카테고리 외 항목은 -inf로 제외
+            total = np.where(mask, total, -np.inf)
 
         # 상위 k개 선택
         if k >= n:
             top_idx = np.argsort(-total)
         else:
-            part = np.argpartition(-total, kth=k - 1)[:k]
+            # k largest land at the tail; no negated N-length copy of total
+            part = np.argpartition(total, n - k)[n - k:]
             top_idx = part[np.argsort(-total[part])]
 
-        out: List[Dict] = []
-        for i in top_idx.tolist():
-            if total[i] == -np.inf:  # 필터링된 항목 건너뛰기
-                continue
-            p = dict(self.products[i])
-            p["score"] = float(total[i])
-            out.append(p)
-
-        return out
+        top_scores = total[top_idx]
+        return [
+            _result_item(products[i], score)
+            for i, score in zip(top_idx.tolist(), top_scores.tolist())
+            if score != -np.inf  # 필터링된 항목 건너뛰기
+        ]
 
 
 _flag = os.getenv("DB_RECO_ENABLED", "").strip().lower()
@@ -78,16 +78,61 @@ class EmbeddingClient:
         """
         여러 텍스트를 배치로 임베딩 벡터로 변환
         
+        서버의 `/embed/batch` 엔드포인트로 한 번에 요청하며,
+        구버전 서버(404)인 경우에만 순차 처리로 폴백
+        
         Args:
             texts: 변환할 텍스트 리스트
             
         Returns:
             List[List[float]]: 임베딩 벡터 리스트
+            
+        Raises:
+            RuntimeError: 임베딩 서버 오류 시
         """
         if not texts:
             return []
         
-        # 현재는 순차 처리 (배치 API가 없을 경우)
+        try:
+            with httpx.Client(timeout=self.timeout) as client:
+                response = client.post(
+                    f"{self.base_url}/embed/batch",
+                    json=[t.strip() for t in texts]
+                )
+                response.raise_for_status()
+                
+                data = response.json()
+                if not isinstance(data, list) or len(data) != len(texts):
+                    raise RuntimeError("Invalid batch embedding response format")
+                
+                embeddings = [item.get("embedding") for item in data]
+                if not all(isinstance(e, list) and e for e in embeddings):
+                    raise RuntimeError("Invalid batch embedding response format")
+                
+                return embeddings
+                
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                # 배치 API가 없는 서버: 순차 처리로 폴백
+                return self._get_embeddings_sequential(texts)
+            self.logger.error(f"Embedding server HTTP error: {e.response.status_code} - {e.response.text}")
+            raise RuntimeError(f"Embedding server HTTP error: {e.response.status_code}")
+            
+        except httpx.TimeoutException:
+            self.logger.error("Embedding server timeout")
+            raise RuntimeError("Embedding server timeout")
+            
+        except RuntimeError:
+            raise
+            
+        except Exception as e:
+            self.logger.error(f"Embedding server error: {e}")
+            raise RuntimeError(f"Embedding server error: {e}")
+    
+    def _get_embeddings_sequential(self, texts: List[str]) -> List[List[float]]:
+        """
+        배치 API가 없는 구버전 서버용 순차 처리 (점진적 배포 기간에만 사용)
+        """
         embeddings = []
         for text in texts:
             try:
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
 import base64
+import hashlib
+import importlib
 import io
 import os
+import random
+import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 
@@ -15,6 +22,119 @@ def _get_env(name: str, default: str | None = None) -> str:
     return os.getenv(name) or (default or "")
 
 
+def _try_import(module: str) -> Any:
+    # Optional SDKs: resolve once per process instead of on every instantiation
+    try:
+        return importlib.import_module(module)
+    except Exception:
+        return None
+
+
+_NEW_GENAI = _try_import("google.genai")
+_LEGACY_GENAI = _try_import("google.generativeai")
+# the package deletes its `client` attribute after import, so resolve the submodule directly
+_LEGACY_CLIENT = _try_import("google.generativeai.client")
+
+# "Retry-After: 12", "retryDelay": "12s", "retry in 12.5s" (Gemini 429 bodies/messages)
+_RETRY_HINT_RE = re.compile(
+    r"retry(?:[-_ ]?after|[-_ ]?delay|\s+in)[\"':\s]*(\d+(?:\.\d+)?)\s*s?", re.I
+)
+
+
+def _retry_after_seconds(err: Exception) -> Optional[float]:
+    """Server-suggested wait from response headers or the error text, if any."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            if value:
+                return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+    match = _RETRY_HINT_RE.search(str(err))
+    if match:
+        return max(0.0, float(match.group(1)))
+    return None
+
+
+# MIME types Gemini accepts as-is; anything else goes through a PIL decode in _normalize_image
+_SUPPORTED_MIME = frozenset({"image/jpeg", "image/png", "image/webp", "image/gif"})
+
+_OVERLOAD_CODES = {429, 500, 502, 503, 504}
+
+
+def _is_overload_error(err: Exception) -> bool:
+    """
+    429 / 5xx style failures that mean "send less", as opposed to bad input. Decided
+    by HTTP status only (google.genai APIError.code, google.api_core exception .code,
+    or an attached response's status_code); message text is not inspected.
+    """
+    candidates = (
+        getattr(err, "code", None),
+        getattr(err, "status_code", None),
+        getattr(getattr(err, "response", None), "status_code", None),
+    )
+    return any(isinstance(code, int) and code in _OVERLOAD_CODES for code in candidates)
+
+
+class GeminiConcurrencyTimeout(RuntimeError):
+    """No limiter slot freed up within the request timeout; retrying would only queue again."""
+
+
+class _AimdLimiter:
+    """
+    Additive-increase / multiplicative-decrease cap on concurrent Gemini calls.
+    The limit grows by `increase` after a success while the latency EWMA is under
+    target, and is multiplied by `decrease` after a rate-limit/overload error, at
+    most once per latency window (the EWMA, or target before any success): a burst
+    of concurrent 429s is one congestion signal, not one per failed call.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        target_ms: float,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+    ) -> None:
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.target_ms = target_ms
+        self.increase = increase
+        self.decrease = decrease
+        self._ewma_ms: Optional[float] = None
+        self._last_decrease: Optional[float] = None  # time.monotonic() of the last cut
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._in_flight < int(self.limit), timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency_ms: float, *, overloaded: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                window_s = (self._ewma_ms if self._ewma_ms is not None else self.target_ms) / 1000.0
+                if self._last_decrease is None or now - self._last_decrease >= window_s:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                ewma = self._ewma_ms
+                self._ewma_ms = latency_ms if ewma is None else 0.8 * ewma + 0.2 * latency_ms
+                if self._ewma_ms <= self.target_ms:
+                    self.limit = min(self.maximum, self.limit + self.increase)
+            self._cond.notify_all()
+
+
 class GeminiImageService:
     """
     Google Gemini image generation (virtual try-on) for Python.
@@ -29,6 +149,11 @@ class GeminiImageService:
       GEMINI_MODEL (default: gemini-2.5-flash-image-preview)
       GEMINI_TIMEOUT_MS (default: 30000)
       GEMINI_MAX_RETRIES (default: 3)
+      GEMINI_RETRY_BASE_MS / GEMINI_RETRY_MAX_MS (default: 1000 / 30000, jittered backoff bounds)
+      GEMINI_CONC_INITIAL / GEMINI_CONC_MIN / GEMINI_CONC_MAX (default: 4 / 1 / 16, AIMD concurrency)
+      GEMINI_CONC_TARGET_MS (default: 20000, latency target for growing the limit)
+      GEMINI_CACHE_MB (default: 0 = off; in-process LRU of generated images, bounded by total size.
+        A hit returns the previous image for identical inputs, so "generate again" repeats it)
       GEMINI_TEMPERATURE (default: 1.0)
       GEMINI_FIXED_PROMPT (optional baseline prompt)
     """
@@ -58,29 +183,41 @@ class GeminiImageService:
         )  # noqa: E501
         self.timeout_ms: int = int(_get_env("GEMINI_TIMEOUT_MS", "30000") or 30000)
         self.max_retries: int = int(_get_env("GEMINI_MAX_RETRIES", "3") or 3)
+        self.retry_base_ms: int = int(_get_env("GEMINI_RETRY_BASE_MS", "1000") or 1000)
+        self.retry_max_ms: int = int(_get_env("GEMINI_RETRY_MAX_MS", "30000") or 30000)
+        # Adaptive cap on in-flight calls so bursts back off before exhausting the key's quota
+        self._limiter = _AimdLimiter(
+            initial=float(_get_env("GEMINI_CONC_INITIAL", "4") or 4),
+            minimum=float(_get_env("GEMINI_CONC_MIN", "1") or 1),
+            maximum=float(_get_env("GEMINI_CONC_MAX", "16") or 16),
+            target_ms=float(_get_env("GEMINI_CONC_TARGET_MS", "20000") or 20000),
+        )
         # Unified temperature: single source of truth (default 1.0)
         self.temperature: float = float(_get_env("GEMINI_TEMPERATURE", "1") or 1)
         # Fixed(기본) 프롬프트: 사용자 프롬프트가 비었을 때 사용하고, 있으면 먼저 baseline으로 붙입니다.
         self.fixed_prompt: str = _get_env("GEMINI_FIXED_PROMPT")
 
-        self._new_client = None  # type: ignore[var-annotated]
-        self._legacy_model = None  # type: ignore[var-annotated]
+        # genai.Client / legacy GenerativeModel per API key (bounded LRU) so TLS/HTTP
+        # sessions survive across calls; guarded for the threaded request handlers
+        self._new_clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._legacy_models: "OrderedDict[str, Any]" = OrderedDict()
+        self._max_clients: int = max(1, len(self.api_keys))
+        self._clients_lock = threading.Lock()
 
-        # Lazy import to avoid hard dependency during setup
-        self._new_genai = None
-        self._legacy_genai = None
-        try:
-            from google import genai as _new_genai  # type: ignore
+        # 동일한 person+garment+prompt 재요청은 캐시된 data URI로 바로 응답 (opt-in).
+        # data URI 하나가 수 MB라 항목 수가 아닌 총 바이트로 제한
+        self._result_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._result_cache_max_bytes: int = max(0, int(float(_get_env("GEMINI_CACHE_MB", "0") or 0) * 1024 * 1024))
+        self._result_cache_bytes = 0
+        self._result_cache_lock = threading.Lock()
 
-            self._new_genai = _new_genai
-        except Exception:
-            self._new_genai = None
-        try:
-            import google.generativeai as _legacy_genai  # type: ignore
+        # AVIF/HEIC -> PNG conversions overlap here; Pillow's C decoders release the GIL
+        self._normalize_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gemini-normalize")
 
-            self._legacy_genai = _legacy_genai
-        except Exception:
-            self._legacy_genai = None
+        # SDK modules are imported once at module load (optional dependencies)
+        self._new_genai = _NEW_GENAI
+        self._legacy_genai = _LEGACY_GENAI
+        self._legacy_client = _LEGACY_CLIENT
 
     # ------------------------------- public API ------------------------------- #
     def available(self) -> bool:
@@ -110,6 +247,18 @@ class GeminiImageService:
                 )
 
         clothing_items = clothing_items or {}
+        # 이미지도 프롬프트도 없으면 base64/PIL 작업 전에 바로 실패
+        has_image = person is not None or any(
+            isinstance(item, dict) and item.get("base64")
+            for item in clothing_items.values()
+        )
+        has_text = bool(
+            (prompt and str(prompt).strip())
+            or (self.fixed_prompt and str(self.fixed_prompt).strip())
+        )
+        if not has_image and not has_text:
+            raise ValueError("Nothing to generate: no person/clothing image and no prompt")
+
         print("[gemini] generate_virtual_try_on_image 호출:")
         print(f"  - person: {'있음' if person else '없음'}")
         print(f"  - clothing_items: {clothing_items}")
@@ -118,16 +267,28 @@ class GeminiImageService:
         parts = self._build_parts(person, clothing_items, prompt)
         print(f"[gemini] _build_parts 결과: {len(parts)}개 파트 생성")
 
+        cache_key = self._cache_key(parts) if self._result_cache_max_bytes else None
+        if cache_key is not None:
+            with self._result_cache_lock:
+                cached = self._result_cache.get(cache_key)
+                if cached is not None:
+                    self._result_cache.move_to_end(cache_key)
+                    print("[gemini] 캐시 적중: 이전 생성 결과 재사용")
+                    return cached
+
         last_error: Optional[Exception] = None
         # Iterate keys with per-key retries
         for key in self.api_keys:
+            prev_ms = float(self.retry_base_ms)
             for attempt in range(1, self.max_retries + 1):
                 try:
-                    if self._new_genai:
-                        image_data_uri = self._call_new_genai(parts, key)
-                    else:
-                        image_data_uri = self._call_legacy_genai(parts, key)
+                    image_data_uri = self._call_with_limiter(parts, key)
+                    if cache_key is not None and image_data_uri:
+                        self._cache_store(cache_key, image_data_uri)
                     return image_data_uri
+                except GeminiConcurrencyTimeout:
+                    # already waited a full timeout for a slot; surface instead of queueing again
+                    raise
                 except Exception as e:  # noqa: BLE001
                     last_error = e
                     # If this looks like an invalid API key, try next key immediately
@@ -139,13 +300,68 @@ class GeminiImageService:
                     ):
                         break  # move to next key
                     if attempt < self.max_retries:
-                        time.sleep(2**attempt)
+                        # Decorrelated jitter keeps concurrent retries from firing in lockstep;
+                        # a server Retry-After hint takes precedence (still capped)
+                        hint = _retry_after_seconds(e)
+                        if hint is not None:
+                            delay_ms = min(float(self.retry_max_ms), hint * 1000.0)
+                        else:
+                            delay_ms = min(
+                                float(self.retry_max_ms),
+                                random.uniform(self.retry_base_ms, prev_ms * 3),
+                            )
+                        prev_ms = max(float(self.retry_base_ms), delay_ms)
+                        time.sleep(delay_ms / 1000.0)
             # next key
         # Exhausted keys / retries
         assert last_error is not None
         raise last_error
 
     # ----------------------------- internal helpers --------------------------- #
+    def _cache_key(self, parts: List[Dict[str, Any]]) -> bytes:
+        # blake2b over model + every text/inline_data part; parts are separated by a
+        # type tag so concatenation boundaries cannot collide
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.model.encode("utf-8"))
+        for part in parts:
+            inline = part.get("inline_data")
+            if inline is not None:
+                data = inline.get("data") or b""
+                h.update(b"\x00I" + str(inline.get("mime_type") or "").encode("utf-8") + b"\x00")
+                h.update(data.encode("ascii") if isinstance(data, str) else data)
+            else:
+                h.update(b"\x00T" + str(part.get("text") or "").encode("utf-8"))
+        return h.digest()
+
+    def _cache_store(self, cache_key: bytes, image_data_uri: str) -> None:
+        size = len(image_data_uri)  # data URIs are ASCII: one byte per character
+        if size > self._result_cache_max_bytes:
+            return
+        with self._result_cache_lock:
+            old = self._result_cache.pop(cache_key, None)
+            if old is not None:
+                self._result_cache_bytes -= len(old)
+            self._result_cache[cache_key] = image_data_uri
+            self._result_cache_bytes += size
+            while self._result_cache_bytes > self._result_cache_max_bytes:
+                _, evicted = self._result_cache.popitem(last=False)
+                self._result_cache_bytes -= len(evicted)
+
+    def _call_with_limiter(self, parts: List[Dict[str, Any]], key: str) -> Optional[str]:
+        if not self._limiter.acquire(timeout=self.timeout_ms / 1000.0):
+            raise GeminiConcurrencyTimeout("Gemini concurrency limit: timed out waiting for a slot")
+        started = time.monotonic()
+        overloaded = False
+        try:
+            if self._new_genai:
+                return self._call_new_genai(parts, key)
+            return self._call_legacy_genai(parts, key)
+        except Exception as e:  # noqa: BLE001
+            overloaded = _is_overload_error(e)
+            raise
+        finally:
+            self._limiter.release((time.monotonic() - started) * 1000.0, overloaded=overloaded)
+
     def _build_parts(
         self, person: Optional[Dict], clothing_items: Dict, prompt: Optional[str]
     ) -> List[Dict[str, Any]]:
@@ -157,11 +373,28 @@ class GeminiImageService:
         if prompt and str(prompt).strip():
             parts.append({"text": str(prompt).strip()})
 
-        # Person image (optional) with detailed role hints
+        # Garments that will be sent, in fixed slot order
+        print(f"[gemini] _build_parts 시작 - clothing_items: {clothing_items}")
+        garments: List[Tuple[str, Dict]] = []
+        for key in ("top", "outer", "pants", "shoes"):
+            item = clothing_items.get(key)
+            print(f"[gemini] {key} 아이템 확인: {item}")
+            if item and item.get("base64"):
+                garments.append((key, item))
+
+        # Normalize every image up front (concurrently when several need conversion)
+        images = ([person] if person is not None else []) + [item for _, item in garments]
+        normalized = self._normalize_images(
+            [(img.get("base64"), img.get("mimeType")) for img in images]
+        )
         if person is not None:
-            p_b64, p_mime = self._normalize_image(
-                person.get("base64"), person.get("mimeType")
-            )
+            person_image, garment_images = normalized[0], normalized[1:]
+        else:
+            person_image, garment_images = None, normalized
+
+        # Person image (optional) with detailed role hints
+        if person_image is not None:
+            p_b64, p_mime = person_image
             # Anchor PERSON image first so the model bases the scene on this subject
             parts.append({"inline_data": {"data": p_b64, "mime_type": p_mime}})
             parts.extend(
@@ -233,8 +466,6 @@ class GeminiImageService:
             )
 
         # Clothing images
-        has_any_clothing = False
-        print(f"[gemini] _build_parts 시작 - clothing_items: {clothing_items}")
         garment_guidance = {
             "top": (
                 "Extract ONLY the top garment (shirts, tees, knitwear)."
@@ -256,48 +487,76 @@ class GeminiImageService:
                 " Align to feet orientation and add subtle contact shadow."
             ),
         }
-        for key in (
-            "top",
-            "outer",
-            "pants",
-            "shoes",
-        ):
-            item = clothing_items.get(key)
-            print(f"[gemini] {key} 아이템 확인: {item}")
-            if item and item.get("base64"):
-                print(f"[gemini] {key} 아이템 처리 중...")
-                b64, mime = self._normalize_image(
-                    item.get("base64"), item.get("mimeType")
-                )
-                # Minimal role hint per garment image
-                parts.append(
-                    {
-                        "text": (
-                            f"GARMENT {key.upper()}: {garment_guidance.get(key, 'Use as-is.')} "
-                            "If any face/head/skin is visible in the garment image, treat it strictly as background and remove it. "
-                            "Do not copy or blend any face from the garment reference. "
-                            "Apply the garment onto the BASE PERSON exactly according to the layering rules without cropping."
-                        )
-                    }
-                )
-                parts.append(
-                    {
-                        "inline_data": {
-                            "data": b64,
-                            "mime_type": mime,
-                        }
+        for (key, _), (b64, mime) in zip(garments, garment_images):
+            print(f"[gemini] {key} 아이템 처리 중...")
+            # Minimal role hint per garment image
+            parts.append(
+                {
+                    "text": (
+                        f"GARMENT {key.upper()}: {garment_guidance.get(key, 'Use as-is.')} "
+                        "If any face/head/skin is visible in the garment image, treat it strictly as background and remove it. "
+                        "Do not copy or blend any face from the garment reference. "
+                        "Apply the garment onto the BASE PERSON exactly according to the layering rules without cropping."
+                    )
+                }
+            )
+            parts.append(
+                {
+                    "inline_data": {
+                        "data": b64,
+                        "mime_type": mime,
                     }
-                )
-                has_any_clothing = True
+                }
+            )
 
         # Allow text-only generation when neither person nor clothing is present
 
         return parts
 
+    def _normalize_images(
+        self, images: List[Tuple[Optional[str], Optional[str]]]
+    ) -> List[Tuple[str, str]]:
+        """_normalize_image over (base64, mime) pairs, preserving order."""
+        pending = sum(1 for _, mime in images if (mime or "image/jpeg").lower() not in _SUPPORTED_MIME)
+        if pending <= 1:
+            return [self._normalize_image(b64, mime) for b64, mime in images]
+        futures = [self._normalize_pool.submit(self._normalize_image, b64, mime) for b64, mime in images]
+        return [f.result() for f in futures]
+
+    def _get_new_client(self, key: str) -> Any:
+        with self._clients_lock:
+            client = self._new_clients.get(key)
+            if client is None:
+                client = self._new_genai.Client(api_key=key)  # type: ignore[attr-defined]
+                self._new_clients[key] = client
+                if len(self._new_clients) > self._max_clients:
+                    self._new_clients.popitem(last=False)
+            else:
+                self._new_clients.move_to_end(key)
+            return client
+
+    def _get_legacy_model(self, key: str) -> Any:
+        with self._clients_lock:
+            model = self._legacy_models.get(key)
+            if model is None:
+                # configure() is process-global and GenerativeModel would only pick up the default
+                # client on its first generate_content (outside this lock), by which time another
+                # key may have been configured. configure() drops the cached default clients, so
+                # build this key's client now and pin it to the model.
+                self._legacy_genai.configure(api_key=key)  # type: ignore[attr-defined]
+                model = self._legacy_genai.GenerativeModel(self.model)  # type: ignore[attr-defined]
+                if self._legacy_client is not None:
+                    model._client = self._legacy_client.get_default_generative_client()
+                self._legacy_models[key] = model
+                if len(self._legacy_models) > self._max_clients:
+                    self._legacy_models.popitem(last=False)
+            else:
+                self._legacy_models.move_to_end(key)
+            return model
+
     def _call_new_genai(self, parts: List[Dict[str, Any]], key: str) -> Optional[str]:
-        # New client: from google import genai
-        # Recreate client per-call to ensure session isolation; do not retain client across calls
-        client = self._new_genai.Client(api_key=key)  # type: ignore[attr-defined]
+        # New client: from google import genai (one cached client per key)
+        client = self._get_new_client(key)
 
         # Convert any base64 strings to raw bytes for the new SDK
         norm_parts: List[Dict[str, Any]] = []
@@ -305,13 +564,18 @@ class GeminiImageService:
             if "inline_data" in p and isinstance(p["inline_data"], dict):
                 mime = p["inline_data"].get("mime_type", "image/jpeg")
                 data = p["inline_data"].get("data")
-                if isinstance(data, str):
+                if isinstance(data, (bytes, bytearray)):
+                    # already raw bytes: pass through without a base64 round-trip
+                    data_bytes = data
+                elif isinstance(data, memoryview):
+                    data_bytes = data.tobytes()
+                elif isinstance(data, str):
                     try:
                         data_bytes = base64.b64decode(data)
                     except Exception:
                         data_bytes = b""
                 else:
-                    data_bytes = data or b""
+                    data_bytes = b""
                 norm_parts.append(
                     {"inline_data": {"data": data_bytes, "mime_type": mime}}
                 )
@@ -319,38 +583,28 @@ class GeminiImageService:
                 # text parts or others as-is
                 norm_parts.append(p)
 
-        try:
-            # The new API mirrors Node but uses snake_case fields
-            # If a PERSON image is present in parts, use a lower temperature to improve adherence/stability
-            has_person = any(
-                isinstance(p, dict) and isinstance(p.get("inline_data"), dict)
-                for p in parts[:4]
-            )
-            temp = min(self.temperature, 0.2) if has_person else self.temperature
-            resp = client.models.generate_content(
-                model=self.model,
-                contents=[{"role": "user", "parts": norm_parts}],
-                config={
-                    "response_modalities": ["IMAGE"],
-                    "temperature": temp,
-                },
-            )
-            return self._extract_image_from_response(resp)
-        finally:
-            # Explicitly drop reference to avoid any implicit session reuse
-            try:
-                del client
-            except Exception:
-                pass
-            self._new_client = None
+        # The new API mirrors Node but uses snake_case fields
+        # If a PERSON image is present in parts, use a lower temperature to improve adherence/stability
+        has_person = any(
+            isinstance(p, dict) and isinstance(p.get("inline_data"), dict)
+            for p in parts[:4]
+        )
+        temp = min(self.temperature, 0.2) if has_person else self.temperature
+        resp = client.models.generate_content(
+            model=self.model,
+            contents=[{"role": "user", "parts": norm_parts}],
+            config={
+                "response_modalities": ["IMAGE"],
+                "temperature": temp,
+            },
+        )
+        return self._extract_image_from_response(resp)
 
     def _call_legacy_genai(
         self, parts: List[Dict[str, Any]], key: str
     ) -> Optional[str]:
-        # Legacy client: import google.generativeai as genai
-        # Configure per-call; avoid retaining model across calls
-        self._legacy_genai.configure(api_key=key)  # type: ignore[attr-defined]
-        model = self._legacy_genai.GenerativeModel(self.model)  # type: ignore[attr-defined]
+        # Legacy client: import google.generativeai as genai (one cached model per key)
+        model = self._get_legacy_model(key)
 
         # Convert to legacy-friendly inputs: list where inline_data -> dict with mime_type, data
         legacy_inputs: List[Any] = []
@@ -366,27 +620,19 @@ class GeminiImageService:
                 )
 
         try:
-            try:
-                has_person = any(
-                    isinstance(p, dict) and p.get("mime_type") and p.get("data")
-                    for p in legacy_inputs[:4]
-                )
-                temp = min(self.temperature, 0.5) if has_person else self.temperature
-                resp = model.generate_content(  # type: ignore[assignment]
-                    legacy_inputs,
-                    generation_config={"temperature": temp},
-                )
-            except TypeError:
-                # For older SDKs without generation_config support
-                resp = model.generate_content(legacy_inputs)
-            return self._extract_image_from_response(resp)
-        finally:
-            # Explicitly drop reference to avoid any implicit session reuse
-            try:
-                del model
-            except Exception:
-                pass
-            self._legacy_model = None
+            has_person = any(
+                isinstance(p, dict) and p.get("mime_type") and p.get("data")
+                for p in legacy_inputs[:4]
+            )
+            temp = min(self.temperature, 0.5) if has_person else self.temperature
+            resp = model.generate_content(  # type: ignore[assignment]
+                legacy_inputs,
+                generation_config={"temperature": temp},
+            )
+        except TypeError:
+            # For older SDKs without generation_config support
+            resp = model.generate_content(legacy_inputs)
+        return self._extract_image_from_response(resp)
 
     @staticmethod
     def _extract_image_from_response(resp: Any) -> Optional[str]:
@@ -441,8 +687,7 @@ class GeminiImageService:
         if not b64:
             raise ValueError("Image base64 is required")
         m = (mime or "image/jpeg").lower()
-        supported = {"image/jpeg", "image/png", "image/webp", "image/gif"}
-        if m in supported:
+        if m in _SUPPORTED_MIME:
             return b64, m
 
         # Convert problematic formats
@@ -475,109 +720,15 @@ class GeminiImageService:
             elif im.mode not in ("RGB", "RGBA"):
                 im = im.convert("RGB")
             out = io.BytesIO()
-            im.save(out, format="PNG")
-            out_b64 = base64.b64encode(out.getvalue()).decode("ascii")
+            # Fast DEFLATE: the PNG is only a transport format for the API, size barely matters
+            im.save(out, format="PNG", optimize=False, compress_level=1)
+            # getbuffer() exposes the BytesIO memory directly (getvalue() would copy it first)
+            with out.getbuffer() as png:
+                out_b64 = base64.b64encode(png).decode("ascii")
             return out_b64, "image/png"
 
         # Fallback: unknown type, keep data but relabel to jpeg to attempt best-effort
         return b64, "image/jpeg"
 
-    # --------------------------- prompt helpers (v2) ------------------------- #
-    @staticmethod
-    def _safety_directives_v2() -> str:
-        return ""
-        return "\n".join(
-            [
-                "CRITICAL SAFETY & CONSISTENCY DIRECTIVES:",
-                "- The FIRST image is the definitive base for the PERSON’s facial identity, background, perspective, and lighting.",
-                "- The face in the FIRST image must be preserved pixel-for-pixel, with absolutely no changes, retouching, or landmark adjustments.",
-                "- No smoothing, beautification, or expression change is allowed.",
-                "- The output must look indistinguishable from a real photo, as if only the clothing was changed in the original environment.",
-                "- Background, shadows, and natural skin textures must be maintained exactly.",
-                "- Remove all backgrounds from clothing product images; only segment the garment(s)—ignore any mannequin/person.",
-                "- Fit each garment naturally to the body and pose, preserving original occlusion (e.g., arms/hands in front stay in front).",
-                "- No text, logo, watermark, or accessories should be added/removed.",
-                "- If there is any conflict, facial identity takes absolute priority.",
-            ]
-        )
-
-    @staticmethod
-    def _build_prompt_v2(clothing_pieces: List[str]) -> str:
-        return ""
-        return (
-            "CRITICAL SAFETY & CONSISTENCY DIRECTIVES:\n\n"
-            "The FIRST image is the definitive base for the person’s facial identity, background, perspective, and lighting.\n"
-            "FACE PIXEL LOCK: Preserve the same face pixel-for-pixel — no changes, retouching, beautification, color shift, or landmark adjustments.\n"
-            "The HEAD MUST REMAIN FULLY VISIBLE; do not crop above the forehead or remove/replace the head. Hair length/style/hairline must remain unchanged.\n"
-            "The output must look indistinguishable from a real photo, as if only the clothing was changed in the original environment.\n"
-            "Background, shadows, and natural skin textures must be maintained exactly.\n"
-            "From each clothing product image: REMOVE background and ANY person/face/hair/skin; segment the garment ONLY.\n"
-            "Fit each garment naturally to the body and pose, preserving original occlusion (e.g., arms/hands in front stay in front).\n"
-            "No text, logo, watermark, or accessories should be added/removed.\n"
-            "If there is any conflict, facial identity takes absolute priority.\n"
-            "TASK (for realistic online fashion try-on):\n"
-            "Step 1: Extract only the garments from product photos, ignoring all background and mannequins.\n"
-            "Step 2: Seamlessly fit all garments to the PERSON’s body in the FIRST image, matching pose, proportions, and natural wrinkles/shading. Do not alter the head, face, or hair.\n"
-            "Step 3: Ensure the output matches the original scene/framing, preserving environment and lighting.\n"
-        )
-
-    @staticmethod
-    def _safety_directives() -> str:
-        return ""
-        return "\n".join(
-            [
-                "CRITICAL SAFETY AND CONSISTENCY DIRECTIVES:",
-                "- The FIRST image MUST be used as the definitive source for the person's face and overall appearance.",
-                "- ABSOLUTELY NO re-synthesis, redrawing, retouching, or alteration of the person's face is permitted.",
-                "- The person's face, including but not limited to: facial structure, landmarks, skin texture, pores, moles, scars, facial hair (if any), hairline, eye shape, nose shape, mouth shape, and expression, MUST remain IDENTICAL and UNCHANGED.",
-                "- Preserve the EXACT facial identity. NO beautification, smoothing, makeup application, or landmark adjustments.",
-                "- DO NOT CHANGE THE PERSON'S FACE SHAPE OR FACIAL STRUCTURE.",
-                "- Maintain the background, perspective, and lighting IDENTICALLY to the original person image.",
-                "- REPLACE existing garments with the provided clothing: top replaces top layer, pants replace pants, shoes replace shoes.",
-                "- Remove/ignore backgrounds from clothing product photos; segment garment only (no mannequin or logos).",
-                "- Fit garments to the person's pose with correct scale/rotation/warping; align perspective and seams.",
-                "- Respect occlusion: body parts (e.g., crossed arms/hands) naturally occlude garments when in front.",
-                "- Ensure the ENTIRE PERSON is visible; garments must cover appropriate regions (top on torso/arms, pants on legs to ankles, shoes on feet).",
-                "- Do NOT add or remove accessories or objects. No text, logos, or watermarks.",
-                "- Treat the face region as STRICTLY PIXEL-LOCKED: identity-specific details MUST remain unchanged and untouched.",
-                "- If any instruction conflicts with another, the preservation of the person's facial identity and the integrity of the face shape are the ABSOLUTE HIGHEST PRIORITIES.",
-            ]
-        )
-
-    @staticmethod
-    def _build_prompt(clothing_pieces: List[str]) -> str:
-        """Single consolidated prompt used for generation (safety + task)."""
-        return ""
-        safety = "\n".join(
-            [
-                "CRITICAL SAFETY AND CONSISTENCY DIRECTIVES:",
-                "- The FIRST image MUST be used as the base and definitive source for the person's identity and appearance.",
-                "- FACE PIXEL LOCK: The face region from the FIRST image must be preserved PIXEL-FOR-PIXEL with ZERO changes.",
-                "- Absolutely NO re-synthesis, redraw, retouch, beautification, color shift, smoothing, makeup, or landmark/shape adjustments to the face.",
-                "- Preserve facial structure, landmarks, skin texture, pores, moles, scars, facial hair (if any), hairline, eye shape, nose shape, mouth shape, expression, skin tone, and lighting EXACTLY.",
-                "- Do NOT crop out the head; keep the full head visible as in the FIRST image.",
-                "- Clothing product photos may contain people or mannequins. IGNORE any person/skin/face/limbs from clothing photos; extract GARMENTS ONLY.",
-                "- Remove backgrounds from clothing photos; segment garments only (no mannequin, no body parts, no logos, no watermarks).",
-                "- Replace existing garments with the provided ones: top replaces top layer, pants replace pants, shoes replace shoes.",
-                "- Fit garments to the person's pose with correct scale/rotation/warping; align perspective and seams; respect occlusion (hands/arms in front remain in front).",
-                "- Maintain the original background, camera perspective, body shape, and scene lighting from the FIRST image.",
-                "- Do NOT add or remove accessories or objects. No text, no extra graphics.",
-                "- If any instruction conflicts with another, preserving the face from the FIRST image is the HIGHEST PRIORITY and MUST NOT be violated.",
-                "- If preserving the face is not possible, return the same face unmodified and only change the garments.",
-            ]
-        )
-
-        items = ", ".join(clothing_pieces)
-        task = (
-            "TASK:\n"
-            "Use the FIRST image as the base. Remove backgrounds from the clothing product photos and extract ONLY the garments (no model body). "
-            "Replace the person's garments with the provided items: top→torso/arms, pants→legs to ankles, shoes→feet. "
-            f"Output a single photorealistic image of the SAME person wearing: {items}. "
-            "Fit garments to the person's pose with correct scale/rotation/warping; match perspective and seam alignment; preserve wrinkles and natural shading. "
-            "Handle occlusion correctly (e.g., crossed arms remain in front of the top where appropriate). "
-            "Keep lighting and shadows consistent. Preserve the face and body shape EXACTLY as in the FIRST image. Do not alter the face. No text, logos, or watermarks."
-        )
-        return f"{safety}\n\n{task}"
-
 
 gemini_image_service = GeminiImageService()
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import math
 import os
+import queue
 from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
@@ -13,6 +17,138 @@ from .catalog import get_catalog_service
 ROOT_DIR = Path(__file__).resolve().parents[3]
 DEFAULT_EMBED_PATH = ROOT_DIR / "data" / "embeddings.npy"
 
+# rows per float16 -> float32 upcast block in _similarity (~4 MB of float32 at D=1024)
+_UPCAST_BLOCK_ROWS = 1024
+# minimum half-width (rows) of the price-sorted candidate window in recommend(), and the
+# slack on its exactness bound (covers float32 rounding of the bound itself)
+_PRICE_WINDOW_MIN = 2000
+_PRICE_WINDOW_EPS = 1e-3
+
+
+def _fp16_enabled() -> bool:
+    # opt-in: the block upcast in _similarity is slower than float32 sgemv on most CPUs
+    # and float16 rounding can reorder near-tied results; only worth it when memory-bound
+    return os.getenv("POS_REC_FP16", "0").strip().lower() in {"1", "true", "on", "yes"}
+
+
+def _int8_enabled() -> bool:
+    # opt-in; takes precedence over POS_REC_FP16 for the embedding matrix
+    return os.getenv("POS_REC_INT8", "0").strip().lower() in {"1", "true", "on", "yes"}
+
+
+def _quantize_int8(emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 quantization of the unit vectors: row i is stored as
+    round(emb[i] * 127 / max|emb[i]|). Returns (int8 matrix, float32 per-row
+    dequant scale). `emb` is scaled in place (it is the scratch normalized copy).
+    """
+    amax = np.abs(emb).max(axis=1)
+    amax[amax == 0] = 1.0
+    scale = (127.0 / amax).astype(np.float32)
+    np.multiply(emb, scale[:, None], out=emb)
+    np.rint(emb, out=emb)
+    return emb.astype(np.int8), np.reciprocal(scale)
+
+
+try:
+    from numba import njit, prange  # type: ignore
+except Exception:  # Optional dependency
+    njit = None  # type: ignore
+    prange = range  # type: ignore
+
+if njit is not None:
+    # cosine + price score fused into one pass over emb_norm (float32 mode only; numba has no
+    # CPU float16 arithmetic, so the opt-in float16 cache keeps the BLAS path below)
+    # lazy signature: emb_norm may be a read-only memmap, which numba types separately
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _fused_score_kernel(emb_norm, q, log_prices, qlog, alpha, w1, w2, out):  # pragma: no cover - numba only
+        n, d = emb_norm.shape
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += emb_norm[i, j] * q[j]
+            out[i] = w1 * acc + w2 * math.exp(-alpha * abs(log_prices[i] - qlog))
+else:
+    _fused_score_kernel = None  # type: ignore
+
+
+def _numba_enabled() -> bool:
+    return _fused_score_kernel is not None and os.getenv("POS_REC_NUMBA", "1").strip().lower() not in {"0", "false", "off", "no"}
+
+
+def _similarity(
+    emb_norm: np.ndarray, q: np.ndarray, out: np.ndarray, row_scale: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    emb_norm @ q written into the float32 buffer `out`. np.dot on a C-contiguous
+    float32 matrix and vector goes straight to BLAS sgemv. float16 / int8 matrices
+    are upcast block by block so the matmul still runs on float32 BLAS while only
+    half / a quarter of the bytes are streamed from memory (NumPy has no BLAS path
+    for either, and an int8 np.dot would also accumulate in int8). int8 rows are
+    dequantized afterwards with the per-row `row_scale`.
+    """
+    if emb_norm.dtype == np.float32:
+        return np.dot(emb_norm, q, out=out)
+    n = emb_norm.shape[0]
+    sim = out
+    for start in range(0, n, _UPCAST_BLOCK_ROWS):
+        stop = min(start + _UPCAST_BLOCK_ROWS, n)
+        np.dot(emb_norm[start:stop].astype(np.float32), q, out=sim[start:stop])
+    if row_scale is not None:
+        sim *= row_scale
+    return sim
+
+
+def _fused_scores(
+    emb_norm: np.ndarray,
+    q: np.ndarray,
+    log_prices: np.ndarray,
+    qlog: float,
+    alpha: float,
+    w1: float,
+    w2: float,
+    row_scale: Optional[np.ndarray],
+    total: np.ndarray,
+    sim: np.ndarray,
+    price_score: np.ndarray,
+) -> np.ndarray:
+    """
+    w1 * cos + w2 * exp(-alpha * |log_prices - qlog|) written into `total`. Shared by the
+    full scan and the price window so both paths rank with the same arithmetic: the fused
+    numba kernel for C-contiguous float32 matrices, else BLAS similarity plus NumPy
+    (`sim` and `price_score` are scratch buffers).
+    """
+    if _numba_enabled() and emb_norm.dtype == np.float32 and emb_norm.flags.c_contiguous:
+        # np.asarray strips the np.memmap subclass (no copy) for numba's typed signature
+        _fused_score_kernel(
+            np.asarray(emb_norm),
+            np.ascontiguousarray(q, dtype=np.float32),
+            log_prices,
+            float(qlog),
+            float(alpha),
+            float(w1),
+            float(w2),
+            total,
+        )
+        return total
+    # cosine similarity via dot with normalized vectors
+    _similarity(emb_norm, q, out=sim, row_scale=row_scale)
+
+    # price score exp(-alpha * |clog - qlog|)
+    np.subtract(log_prices, qlog, out=price_score)
+    np.abs(price_score, out=price_score)
+    price_score *= -alpha
+    np.exp(price_score, out=price_score)
+    np.multiply(price_score, w2, out=total)
+    sim *= w1
+    total += sim
+    return total
+
+
+def _result_item(row: Dict, score: float) -> Dict:
+    # rows are flat apart from "tags"; a fresh tags list keeps callers from mutating the template
+    return {**row, "score": score, "tags": list(row["tags"])}
+
 
 class PosRecommender:
     """
@@ -23,10 +159,31 @@ class PosRecommender:
     def __init__(self) -> None:
         # config
         self.embed_path = Path(os.getenv("POS_REC_EMBEDDINGS_PATH", str(DEFAULT_EMBED_PATH)))
+        # normalized copy (float32, float16 with POS_REC_FP16=1, or int8 with POS_REC_INT8=1)
+        # memory-mapped on later starts; the sidecar .meta.json records the size, mtime and sha1
+        # of the source it was built from (sha1 is only recomputed when size/mtime change), and int8 caches keep their per-row scales in <stem>_scale.npy
+        if _int8_enabled():
+            suffix = "_norm_i8"
+        else:
+            suffix = "_norm_f16" if _fp16_enabled() else "_norm"
+        self.norm_path = self.embed_path.with_name(self.embed_path.stem + suffix + ".npy")
+        self.norm_meta_path = self.norm_path.with_suffix(".meta.json")
+        self.scale_path = self.embed_path.with_name(self.embed_path.stem + suffix + "_scale.npy")
         # state
-        self._emb: Optional[np.ndarray] = None
         self._emb_norm: Optional[np.ndarray] = None
+        # per-row dequant scale when _emb_norm is int8, else None
+        self._row_scale: Optional[np.ndarray] = None
         self._prices: Optional[np.ndarray] = None
+        # log1p(prices) as float32, computed once at load (always float32: at won price
+        # scales float16 steps of ~0.004 are large enough to reorder price-weighted results)
+        self._log_prices: Optional[np.ndarray] = None
+        # catalog positions sorted by log-price, and _log_prices in that order
+        self._price_order: Optional[np.ndarray] = None
+        self._sorted_log_prices: Optional[np.ndarray] = None
+        # result-shaped catalog rows by position, snapshotted with prices at load
+        self._catalog_rows: List[Dict] = []
+        # (sim, total, price_score) N-length buffers rented per call; grows to the peak request concurrency
+        self._buf_pool: "queue.SimpleQueue[Tuple[np.ndarray, np.ndarray, np.ndarray]]" = queue.SimpleQueue()
         self._count: int = 0
         self._dim: int = 0
 
@@ -36,38 +193,204 @@ class PosRecommender:
         try:
             if not self.embed_path.exists():
                 return
-            emb = np.load(self.embed_path)
-            if not isinstance(emb, np.ndarray):
-                return
-            if emb.dtype != np.float32:
-                emb = emb.astype(np.float32, copy=False)
-            self._emb = emb
-            self._count, self._dim = emb.shape[0], int(emb.shape[1])
-            # precompute L2 norms
-            norms = np.linalg.norm(emb, axis=1)
-            norms[norms == 0] = 1e-8
-            self._emb_norm = emb / norms[:, None]
+            src_stat = self.embed_path.stat()
+            row_scale: Optional[np.ndarray] = None
+            if self._norm_cache_valid(src_stat):
+                emb_norm = np.load(self.norm_path, mmap_mode="r")
+                if emb_norm.dtype == np.int8:
+                    row_scale = np.load(self.scale_path)
+            else:
+                emb = np.load(self.embed_path)
+                if not isinstance(emb, np.ndarray):
+                    return
+                if emb.dtype != np.float32:
+                    emb = emb.astype(np.float32, copy=False)
+                # normalize in place: only the unit vectors are ever used, so no second N x D array
+                norms = np.linalg.norm(emb, axis=1, keepdims=True)
+                norms[norms == 0] = 1e-8
+                emb_norm = np.divide(emb, norms, out=emb)
+                if _int8_enabled():
+                    emb_norm, row_scale = _quantize_int8(emb_norm)
+                elif _fp16_enabled():
+                    emb_norm = emb_norm.astype(np.float16)
+                digest = self._source_sha1()
+                if digest is not None:
+                    emb_norm = self._write_norm_cache(emb_norm, digest, src_stat, row_scale)
+            self._emb_norm = emb_norm
+            self._row_scale = row_scale
+            self._count, self._dim = emb_norm.shape[0], int(emb_norm.shape[1])
 
             # align with catalog prices (assumes same ordering by pos)
             catalog = get_catalog_service().get_all()
             if len(catalog) != self._count:
                 # length mismatch – mark unavailable
-                self._emb = None
-                self._emb_norm = None
-                self._prices = None
-                self._count = 0
+                self._reset_state()
                 return
-            prices = np.array([int(p.get("price", 0)) for p in catalog], dtype=np.float32)
+            prices = np.fromiter(
+                (int(p.get("price", 0)) for p in catalog), dtype=np.float32, count=len(catalog)
+            )
             self._prices = prices
+            log_prices = np.log1p(prices)
+            self._log_prices = log_prices
+            self._price_order = np.argsort(log_prices, kind="stable")
+            self._sorted_log_prices = log_prices[self._price_order]
+            # all per-field coercion happens here once; recommend() only adds "score" (and copies tags).
+            # tags are copied so result rows never alias the catalog service's own lists
+            self._catalog_rows = [
+                {
+                    "id": str(p.get("id")),
+                    "title": p.get("title") or "",
+                    "price": int(p.get("price", 0)),
+                    "tags": list(p.get("tags") or ()),
+                    "category": p.get("category") or "top",
+                    "imageUrl": p.get("imageUrl"),
+                    "productUrl": p.get("productUrl"),
+                }
+                for p in catalog
+            ]
         except Exception:
-            self._emb = None
-            self._emb_norm = None
-            self._prices = None
-            self._count = 0
+            self._reset_state()
+
+    def _reset_state(self) -> None:
+        # drop every derived array too, so a failed reload never leaves a stale price index behind
+        self._emb_norm = None
+        self._row_scale = None
+        self._prices = None
+        self._log_prices = None
+        self._price_order = None
+        self._sorted_log_prices = None
+        self._catalog_rows = []
+        self._count = 0
+
+    def _source_sha1(self) -> Optional[str]:
+        h = hashlib.sha1()
+        try:
+            with open(self.embed_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    def _norm_cache_valid(self, src_stat: os.stat_result) -> bool:
+        try:
+            meta = json.loads(self.norm_meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if meta.get("dtype") == "int8" and not self.scale_path.exists():
+            return False
+        if not self.norm_path.exists():
+            return False
+        # unchanged size and mtime: trust the cache without reading the whole source file
+        if meta.get("source_size") == src_stat.st_size and meta.get("source_mtime_ns") == src_stat.st_mtime_ns:
+            return True
+        # touched or copied: fall back to the content hash, and record the new stat when it matches
+        digest = self._source_sha1()
+        if digest is None or meta.get("source_sha1") != digest:
+            return False
+        meta.update(source_size=src_stat.st_size, source_mtime_ns=src_stat.st_mtime_ns)
+        try:
+            self.norm_meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        except OSError:
+            pass
+        return True
+
+    def _write_norm_cache(
+        self,
+        emb_norm: np.ndarray,
+        digest: str,
+        src_stat: os.stat_result,
+        row_scale: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        # write to a temp name and rename so concurrently booting workers never mmap a partial file
+        tmp = self.norm_path.with_name(f"{self.norm_path.stem}.{os.getpid()}.tmp.npy")
+        try:
+            if row_scale is not None:
+                np.save(self.scale_path, row_scale)
+            np.save(tmp, emb_norm)
+            os.replace(tmp, self.norm_path)
+            meta = {
+                "source_sha1": digest,
+                "source_size": src_stat.st_size,
+                "source_mtime_ns": src_stat.st_mtime_ns,
+                "dtype": str(emb_norm.dtype),
+                "shape": list(emb_norm.shape),
+            }
+            self.norm_meta_path.write_text(json.dumps(meta), encoding="utf-8")
+            return np.load(self.norm_path, mmap_mode="r")
+        except OSError:
+            # read-only data dir: keep the in-memory copy
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return emb_norm
+
+    def _rent_buffers(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        try:
+            bufs = self._buf_pool.get_nowait()
+            if bufs[0].shape[0] == self._count:
+                return bufs
+        except queue.Empty:
+            pass
+        n = self._count
+        return tuple(np.empty(n, dtype=np.float32) for _ in range(3))  # type: ignore[return-value]
 
     def available(self) -> bool:
         return self._emb_norm is not None and self._prices is not None and self._count > 0
 
+    def _price_window_top_k(
+        self, q: np.ndarray, qlog: float, pos_arr: np.ndarray, k: int, alpha: float, w1: float, w2: float
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Score only the rows whose log-price is nearest qlog (a slice of the price-sorted
+        index) and return (top_idx, scores) when that is provably the full-scan answer.
+        A row outside the window scores at most w1 + w2 * exp(-alpha * gap), gap being the
+        log-price distance to the nearest excluded row, so the window result is used only
+        when its k-th score reaches that bound. Worth trying only for price-dominated
+        weights; with the default w1 = 0.97 the bound is never met, so return None early.
+        """
+        n = self._count
+        half = max(k * 50, _PRICE_WINDOW_MIN)
+        if not (0 <= w1 <= w2) or alpha <= 0 or 2 * half > n // 4:
+            return None
+        order, sorted_lp = self._price_order, self._sorted_log_prices
+        if order is None or sorted_lp is None:
+            return None
+        center = int(np.searchsorted(sorted_lp, qlog))
+        lo, hi = max(0, center - half), min(n, center + half)
+        cand = order[lo:hi]
+
+        m = cand.shape[0]
+        row_scale = self._row_scale
+        # the gathered rows are a C-contiguous copy, so this takes the same kernel as the full scan
+        total = _fused_scores(
+            self._emb_norm[cand],  # type: ignore[index]
+            q,
+            sorted_lp[lo:hi],
+            qlog,
+            alpha,
+            w1,
+            w2,
+            None if row_scale is None else row_scale[cand],
+            np.empty(m, dtype=np.float32),
+            np.empty(m, dtype=np.float32),
+            np.empty(m, dtype=np.float32),
+        )
+        total[np.isin(cand, pos_arr)] = -np.inf  # exclude query items
+
+        if m < k:
+            return None
+        part = np.argpartition(total, m - k)[m - k:]
+        part = part[np.argsort(-total[part])]
+        gap = min(
+            qlog - sorted_lp[lo - 1] if lo > 0 else np.inf,
+            sorted_lp[hi] - qlog if hi < n else np.inf,
+        )
+        if total[part[-1]] < w1 + w2 * np.exp(-alpha * gap) + _PRICE_WINDOW_EPS:
+            return None
+        return cand[part], total[part]
+
     def recommend(
         self,
         positions: List[int],
@@ -82,56 +405,52 @@ class PosRecommender:
 
         # validate
         n = self._count
-        if any(p < 0 or p >= n for p in positions):
+        pos_arr = np.asarray(positions, dtype=np.intp)
+        if pos_arr.size and ((pos_arr < 0) | (pos_arr >= n)).any():
             raise ValueError("positions out of range")
-        k = max(1, min(int(top_k), n))
+        # query items are excluded, so at most n - len(set(positions)) results exist
+        k = min(max(1, int(top_k)), n - len(set(positions)))
+        if k <= 0:
+            return []
 
         emb_norm = self._emb_norm  # type: ignore[assignment]
         prices = self._prices  # type: ignore[assignment]
 
         # query embedding (mean of selected)
-        q = emb_norm[positions].mean(axis=0)
+        row_scale = self._row_scale
+        if row_scale is not None:
+            q = (emb_norm[pos_arr] * row_scale[pos_arr, None]).mean(axis=0, dtype=np.float32)
+        else:
+            q = emb_norm[pos_arr].mean(axis=0, dtype=np.float32)
         q_norm = np.linalg.norm(q)
         if q_norm == 0:
             q_norm = 1e-8
         q = q / q_norm
 
-        # cosine similarity via dot with normalized vectors
-        sim = emb_norm @ q  # shape (N,)
-
-        # price score
-        qprice = float(prices[positions].mean())
-        clog = np.log1p(prices)
+        qprice = float(prices[pos_arr].mean())
         qlog = np.log1p(qprice)
-        price_score = np.exp(-alpha * np.abs(clog - qlog))
+        log_prices = self._log_prices  # type: ignore[assignment]
 
-        # weighted total
-        total = w1 * sim + w2 * price_score
-        total[np.array(positions, dtype=int)] = -np.inf  # exclude query items
+        windowed = self._price_window_top_k(q, qlog, pos_arr, k, alpha, w1, w2)
+        if windowed is not None:
+            rows = self._catalog_rows
+            top_idx, top_scores = windowed
+            return [_result_item(rows[idx], score) for idx, score in zip(top_idx.tolist(), top_scores.tolist())]
 
-        # top-k
-        if k >= n:
-            top_idx = np.argsort(-total)
-        else:
-            part = np.argpartition(-total, kth=k - 1)[:k]
+        sim, total, price_score = self._rent_buffers()
+        try:
+            _fused_scores(emb_norm, q, log_prices, qlog, alpha, w1, w2, row_scale, total, sim, price_score)
+            total[pos_arr] = -np.inf  # exclude query items
+
+            # top-k: partition so the k largest sit at the tail, then sort only those k
+            part = np.argpartition(total, n - k)[n - k:] if k < n else np.arange(n)
             top_idx = part[np.argsort(-total[part])]
 
-        # map to internal RecommendationItem-like dicts
-        catalog = get_catalog_service().get_all()
-        out: List[Dict] = []
-        for idx in top_idx.tolist():
-            p = catalog[idx]
-            out.append({
-                "id": str(p.get("id")),
-                "title": p.get("title") or "",
-                "price": int(p.get("price", 0)),
-                "tags": p.get("tags") or [],
-                "category": p.get("category") or "top",
-                "imageUrl": p.get("imageUrl"),
-                "productUrl": p.get("productUrl"),
-                "score": float(total[idx]),
-            })
-        return out
+            # map to internal RecommendationItem-like dicts
+            rows = self._catalog_rows
+            return [_result_item(rows[idx], float(total[idx])) for idx in top_idx.tolist()]
+        finally:
+            self._buf_pool.put((sim, total, price_score))
 
 
 @lru_cache(maxsize=1)
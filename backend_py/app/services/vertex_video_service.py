@@ -1,18 +1,36 @@
-﻿import logging
+import asyncio
+import importlib.util
+import json
+import logging
 import os
+import random
 import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import httpx
 from fastapi import HTTPException
 from urllib.parse import quote
 from google.auth import default
 from google.auth.transport.requests import Request
 
+try:
+    import orjson  # Optional dependency: faster (de)serialization of large base64 payloads
+except Exception:
+    orjson = None
+
+
+__all__ = ["VertexVideoService", "reset_env_cache", "vertex_video_service"]
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 multiplexing only when the optional `h2` package is installed (httpx[http2])
+_HTTP2 = importlib.util.find_spec("h2") is not None
 
+
+# Vertex 설정 env는 런타임에 바뀌지 않으므로 프로세스당 한 번만 조회 (누락 시 예외는 캐시되지 않음)
+@lru_cache(maxsize=None)
 def _get_env(name: str, default_value: Optional[str] = None) -> str:
     value = os.getenv(name, default_value)
     if not value:
@@ -20,6 +38,69 @@ def _get_env(name: str, default_value: Optional[str] = None) -> str:
     return value
 
 
+@lru_cache(maxsize=None)
+def _getenv_optional(name: str, default_value: str) -> str:
+    return os.getenv(name, default_value)
+
+
+@lru_cache(maxsize=1)
+def _predict_url() -> str:
+    project_id = _get_env("VERTEX_PROJECT_ID")
+    location_id = _get_env("VERTEX_LOCATION", "us-central1")
+    model_id = _get_env("VERTEX_MODEL_ID", "veo-3.0-generate-001")
+    api_endpoint = _getenv_optional("VERTEX_API_ENDPOINT", f"{location_id}-aiplatform.googleapis.com")
+    return (
+        f"https://{api_endpoint}/v1/projects/{project_id}/locations/{location_id}/"
+        f"publishers/google/models/{model_id}:predictLongRunning"
+    )
+
+
+@lru_cache(maxsize=1)
+def _fetch_url() -> str:
+    project_id = _get_env("VERTEX_PROJECT_ID")
+    location_id = _get_env("VERTEX_LOCATION", "us-central1")
+    model_id = _get_env("VERTEX_MODEL_ID", "veo-3.0-fast-generate-001")
+    api_endpoint = _getenv_optional("VERTEX_API_ENDPOINT", f"{location_id}-aiplatform.googleapis.com")
+    return (
+        f"https://{api_endpoint}/v1/projects/{project_id}/locations/{location_id}/"
+        f"publishers/google/models/{model_id}:fetchPredictOperation"
+    )
+
+
+def reset_env_cache() -> None:
+    """Forget memoized env lookups and endpoint URLs (tests / config reload)."""
+    _get_env.cache_clear()
+    _getenv_optional.cache_clear()
+    _predict_url.cache_clear()
+    _fetch_url.cache_clear()
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """Retry-After as delta-seconds or an HTTP-date; None when absent or unparseable."""
+    raw = response.headers.get("Retry-After") if response is not None else None
+    if not raw:
+        return None
+    raw = raw.strip()
+    if raw.isdigit():
+        return float(raw)
+    try:
+        return max(0.0, parsedate_to_datetime(raw).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
 def _extract_base64(image_data: str, fallback_mime: str = "image/png") -> Tuple[str, str]:
     if image_data.startswith("data:"):
         try:
@@ -31,53 +112,201 @@ def _extract_base64(image_data: str, fallback_mime: str = "image/png") -> Tuple[
     return image_data.strip(), fallback_mime
 
 
+# keys whose string value is a video location wherever they appear under the operation response
+_URI_KEYS = frozenset({"videoUri", "video_uri", "outputUri", "output_uri"})
+_URI_LIST_KEYS = frozenset({"videoUris", "video_uris"})
+# generic location keys count only directly inside a video container (videos[], generatedVideos[],
+# generatedSamples[].video, content[].media); elsewhere they may be echoed input images
+_CONTAINER_URI_KEYS = frozenset({"uri", "gcsUri"})
+_VIDEO_CONTAINERS = frozenset({"videos", "generatedVideos", "video", "Video", "media"})
+
+
+def _walk_uris(node: Any, in_video: bool = False) -> Iterator[str]:
+    # exact type checks: operation JSON only ever holds plain dict/list/str
+    if type(node) is dict:
+        if in_video:
+            mime = node.get("mimeType")
+            if type(mime) is str and mime and not mime.startswith("video/"):
+                in_video = False  # e.g. a thumbnail listed next to the video
+        for key, value in node.items():
+            kind = type(value)
+            if kind is str:
+                if value and (key in _URI_KEYS or (in_video and key in _CONTAINER_URI_KEYS)):
+                    yield value
+            elif kind is list and key in _URI_LIST_KEYS:
+                yield from (v for v in value if type(v) is str)
+            elif kind is dict or kind is list:
+                yield from _walk_uris(value, key in _VIDEO_CONTAINERS)
+    elif type(node) is list:
+        for item in node:
+            yield from _walk_uris(item, in_video)
+
+
+# shortest wait between background token refreshes (short-lived credentials would otherwise spin)
+_REFRESH_MIN_INTERVAL = 30.0
+
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
 class VertexVideoService:
+    __slots__ = (
+        "_scopes",
+        "_token_lock",
+        "_token_cache",
+        "_credentials",
+        "_preferred_variant",
+        "_refresher",
+        "_stop_refresh",
+        "_client_lock",
+        "_client",
+        "_aclient",
+    )
+
     def __init__(self) -> None:
         self._scopes = ["https://www.googleapis.com/auth/cloud-platform"]
         self._token_lock = threading.Lock()
         self._token_cache: Optional[Tuple[str, float]] = None
+        # loaded once (ADC/env/metadata probing is slow); later refreshes reuse the same object
+        self._credentials: Any = None
+        # payload shape Vertex last accepted ("A"/"B"), tried first on the next request
+        self._preferred_variant: Optional[str] = None
+        self._refresher: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        # 하나의 Client를 재사용해 keep-alive 연결 풀 유지 (폴링마다 TCP+TLS 핸드셰이크 방지);
+        # sync/async 각각 처음 쓰일 때 생성
+        self._client_lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.Client:
+        client = self._client
+        if client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+                client = self._client
+        return client
+
+    def _ahttp(self) -> httpx.AsyncClient:
+        # async 라우트용 (이벤트 루프를 막지 않고 여러 작업을 동시에 폴링)
+        client = self._aclient
+        if client is None:
+            with self._client_lock:
+                if self._aclient is None:
+                    self._aclient = httpx.AsyncClient(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+                client = self._aclient
+        return client
+
+    def close(self) -> None:
+        self._stop_refresh.set()
+        if self._client is not None:
+            self._client.close()
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+        self.close()
+
+    def _cached_token(self) -> Optional[str]:
+        # (token, expiry) is swapped as one tuple, so this read needs no lock
+        cache = self._token_cache
+        if cache and time.time() < cache[1] - 60:
+            return cache[0]
+        return None
 
     def _get_access_token(self) -> str:
-        now = time.time()
+        token = self._cached_token()
+        if token:
+            return token
         with self._token_lock:
-            if self._token_cache and now < self._token_cache[1] - 60:
-                return self._token_cache[0]
-
+            # another thread may have refreshed while we waited for the lock
+            token = self._cached_token()
+            if token:
+                return token
+            token = self._refresh_token()
+        self._ensure_refresher()
+        return token
+
+    def _refresh_token(self, *, force: bool = False) -> str:
+        """Load/refresh credentials and swap in a new (token, expiry). Caller holds _token_lock."""
+        now = time.time()
+        credentials = self._credentials
+        if credentials is None:
             try:
                 # 🆕 로컬과 CI/CD 모두 지원하는 인증 방식
                 credentials = self._get_credentials()
             except Exception as exc:
                 logger.exception("Failed to load Google credentials")
                 raise HTTPException(status_code=503, detail="Unable to load Google credentials") from exc
+            self._credentials = credentials
+
+        if force or not credentials.valid or not getattr(credentials, "token", None):
+            try:
+                credentials.refresh(Request())
+            except Exception as exc:
+                # reload from scratch next time in case the source itself went bad
+                self._credentials = None
+                logger.exception("Failed to refresh Google credentials")
+                raise HTTPException(status_code=503, detail="Unable to refresh Google credentials") from exc
+
+        token = getattr(credentials, "token", None)
+        if not token:
+            raise HTTPException(status_code=503, detail="Missing access token from Google credentials")
+
+        expiry = getattr(credentials, "expiry", None)
+        expiry_ts = now + 300
+        if expiry is not None:
+            try:
+                expiry_ts = expiry.timestamp()
+            except Exception:
+                pass
 
-            if not credentials.valid or not getattr(credentials, "token", None):
-                try:
-                    credentials.refresh(Request())
-                except Exception as exc:
-                    logger.exception("Failed to refresh Google credentials")
-                    raise HTTPException(status_code=503, detail="Unable to refresh Google credentials") from exc
-
-            token = getattr(credentials, "token", None)
-            if not token:
-                raise HTTPException(status_code=503, detail="Missing access token from Google credentials")
-
-            expiry = getattr(credentials, "expiry", None)
-            expiry_ts = now + 300
-            if expiry is not None:
-                try:
-                    expiry_ts = expiry.timestamp()
-                except Exception:
-                    pass
-
-            self._token_cache = (token, expiry_ts)
+        self._token_cache = (token, expiry_ts)
+        return token
+
+    def _ensure_refresher(self) -> None:
+        # started on first successful token fetch so deployments without video never probe credentials
+        if self._refresher is not None:
+            return
+        with self._token_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="vertex-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        """Renew the token ~2 minutes before expiry so foreground calls never wait on a refresh."""
+        delay = 0.0
+        while not self._stop_refresh.wait(delay):
+            cache = self._token_cache
+            due = (cache[1] - 120 - time.time()) if cache else 0.0
+            if due > 0:
+                delay = due
+                continue
+            try:
+                with self._token_lock:
+                    self._refresh_token(force=True)
+                # a credential living <= 2 minutes is "due" again at once; never poll faster than the floor
+                cache = self._token_cache
+                due = (cache[1] - 120 - time.time()) if cache else 0.0
+                delay = max(due, _REFRESH_MIN_INTERVAL)
+            except Exception:  # noqa: BLE001
+                # foreground calls still refresh on demand; try again shortly
+                delay = 30.0
+
+    async def _aget_access_token(self) -> str:
+        token = self._cached_token()
+        if token:
             return token
+        # credential refresh is blocking I/O; keep it off the event loop
+        return await asyncio.to_thread(self._get_access_token)
 
     def _get_credentials(self):
         """로컬과 CI/CD 모두 호환되는 Google Cloud 인증 (Base64 지원)"""
-        import json
         import base64
         from google.oauth2 import service_account
-        from google.auth import default
 
         # 1. Base64로 인코딩된 JSON 읽기 (CI/CD용 - 안전)
         credentials_b64 = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_B64')
@@ -119,19 +348,20 @@ class VertexVideoService:
             raise
 
     @staticmethod
-    def _sanitize_parameters(parameters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    def _sanitize_parameters(
+        parameters: Optional[Dict[str, Any]], trusted: bool = False
+    ) -> Dict[str, Any]:
         if not parameters:
             return {}
-        safe: Dict[str, Any] = {}
-        for key, value in parameters.items():
-            if value is None:
-                continue
-            # Preserve primitive types; avoid coercing numbers/bools to strings
-            if isinstance(value, (str, bool, int, float)):
-                safe[key] = value
-            else:
-                safe[key] = str(value)
-        return safe
+        if trusted:
+            # caller built the dict from validated primitives; only drop unset values
+            return {key: value for key, value in parameters.items() if value is not None}
+        # Preserve primitive types; avoid coercing numbers/bools to strings
+        return {
+            key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in parameters.items()
+            if value is not None
+        }
 
     def _build_payload_variants(
         self,
@@ -140,55 +370,73 @@ class VertexVideoService:
         image_data: Optional[str],
         mime_type: str,
         parameters: Optional[Dict[str, Any]] = None,
-    ) -> List[Dict[str, Any]]:
-        params = self._sanitize_parameters(parameters)
-        variants: List[Dict[str, Any]] = []
-
-        # Variant A: prompt string + single image field (bytesBase64Encoded)
-        if image_data:
-            variants.append(
-                {
-                    "instances": [
-                        {
-                            "prompt": prompt,
-                            "image": {
-                                "mimeType": mime_type,
-                                "bytesBase64Encoded": image_data,
-                            },
-                        }
-                    ],
-                    "parameters": params,
-                }
-            )
-
-        # Variant B: nested prompt object with images[] (legacy attempt)
-        if image_data:
-            variants.append(
-                {
-                    "instances": [
-                        {
-                            "prompt": {
-                                "text": prompt,
-                                "images": [
-                                    {"mimeType": mime_type, "imageBytes": image_data}
-                                ],
-                            }
-                        }
-                    ],
-                    "parameters": params,
-                }
-            )
+        trusted_parameters: bool = False,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (variant, payload) in fallback order; later ones are only built if an earlier one is rejected."""
+        # sanitized once and shared by every variant
+        params = self._sanitize_parameters(parameters, trusted=trusted_parameters)
+
+        order: Tuple[str, ...] = ("A", "B", "C") if image_data else ("C",)
+        preferred = self._preferred_variant
+        if preferred in order and preferred != order[0]:
+            order = (preferred,) + tuple(v for v in order if v != preferred)
+        for variant in order:
+            yield variant, self._payload_variant(variant, prompt, image_data, mime_type, params)
 
-        # Variant C: text-only prompt
-        variants.append(
-            {
+    @staticmethod
+    def _payload_variant(
+        variant: str,
+        prompt: str,
+        image_data: Optional[str],
+        mime_type: str,
+        params: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        if variant == "A":
+            # Variant A: prompt string + single image field (bytesBase64Encoded)
+            return {
                 "instances": [
-                    {"prompt": prompt}
+                    {
+                        "prompt": prompt,
+                        "image": {
+                            "mimeType": mime_type,
+                            "bytesBase64Encoded": image_data,
+                        },
+                    }
                 ],
                 "parameters": params,
             }
-        )
-        return variants
+
+        if variant == "B":
+            # Variant B: nested prompt object with images[] (legacy attempt)
+            return {
+                "instances": [
+                    {
+                        "prompt": {
+                            "text": prompt,
+                            "images": [
+                                {"mimeType": mime_type, "imageBytes": image_data}
+                            ],
+                        }
+                    }
+                ],
+                "parameters": params,
+            }
+
+        # Variant C: text-only prompt
+        return {
+            "instances": [
+                {"prompt": prompt}
+            ],
+            "parameters": params,
+        }
+
+    def _record_variant(self, variant: str, accepted: bool) -> None:
+        # Only image-carrying shapes are remembered: preferring text-only C would silently drop images
+        if accepted:
+            if variant != "C":
+                self._preferred_variant = variant
+        elif variant == self._preferred_variant:
+            self._preferred_variant = None
 
 
     def _gcs_media_url(self, gcs_uri: str) -> str:
@@ -198,68 +446,128 @@ class VertexVideoService:
         if '/' not in without:
             raise HTTPException(status_code=400, detail='invalid gcs uri: missing object path')
         bucket, obj = without.split('/', 1)
-        from urllib.parse import quote as _quote
-        return f'https://storage.googleapis.com/storage/v1/b/{bucket}/o/{_quote(obj, safe="")}\?alt=media'
+        return f'https://storage.googleapis.com/storage/v1/b/{bucket}/o/{quote(obj, safe="")}?alt=media'
 
     def open_uri_stream(self, uri: str) -> httpx.Response:
+        """Open a streaming GET; the caller iterates the body and must close() the response."""
         token = self._get_access_token()
         headers = { 'Authorization': f'Bearer {token}' }
         url = self._gcs_media_url(uri) if isinstance(uri, str) and uri.startswith('gs://') else uri
-        resp = httpx.get(url, headers=headers, timeout=httpx.Timeout(60.0, connect=10.0))
+        client = self._http()
+        req = client.build_request('GET', url, headers=headers)
         try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as exc:  # noqa: BLE001
-            body = exc.response.text if exc.response is not None else str(exc)
-            logger.error('Media fetch failed (%s): %s', exc.response.status_code if exc.response else 0, body)
-            raise HTTPException(status_code=exc.response.status_code if exc.response else 502, detail=body)
+            resp = client.send(req, stream=True)
+        except httpx.HTTPError as exc:  # noqa: BLE001
+            logger.error('Media fetch failed: %s', exc)
+            raise HTTPException(status_code=502, detail=str(exc))
+        if resp.is_error:
+            # error bodies are small; read them for the detail, then release the connection
+            try:
+                body = resp.read().decode('utf-8', errors='replace')
+            finally:
+                resp.close()
+            logger.error('Media fetch failed (%s): %s', resp.status_code, body)
+            raise HTTPException(status_code=resp.status_code, detail=body)
         return resp
 
     def _post_with_retry(
         self,
         *,
         url: str,
-        payload: Dict[str, Any],
+        body: bytes,
         token: str,
         timeout: float,
         max_retries: int = 2,
+        retry_budget: float = 30.0,
     ) -> httpx.Response:
+        # body is serialized once by the caller; every retry resends the same bytes
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
-        attempt = 0
-        last_exc: Optional[Exception] = None
-        while attempt <= max_retries:
+        # cumulative backoff (including Retry-After waits) must fit inside retry_budget seconds
+        deadline = time.monotonic() + retry_budget
+        for attempt in range(max_retries + 1):
             try:
-                resp = httpx.post(
+                resp = self._http().post(
                     url,
-                    json=payload,
+                    content=body,
                     headers=headers,
                     timeout=httpx.Timeout(timeout, connect=min(10.0, timeout)),
                 )
                 resp.raise_for_status()
                 return resp
-            except httpx.HTTPStatusError as exc:  # noqa: BLE001
-                status_code = exc.response.status_code if exc.response is not None else 502
-                body = exc.response.text if exc.response is not None else str(exc)
-                logger.error("Vertex request failed (%s): %s", status_code, body)
-                is_retryable = status_code in {408, 429, 500, 502, 503, 504}
-                if not is_retryable or attempt == max_retries:
-                    raise HTTPException(status_code=status_code, detail=body)
-                last_exc = exc
             except httpx.HTTPError as exc:  # noqa: BLE001
-                logger.warning("Vertex transport error: %s", exc)
-                if attempt == max_retries:
-                    raise HTTPException(status_code=502, detail=str(exc))
-                last_exc = exc
-            attempt += 1
-            sleep_for = min(2.0 * attempt, 5.0)
-            if last_exc:
-                logger.warning("Vertex video request retry %s/%s due to %s", attempt, max_retries, last_exc)
+                sleep_for = self._retry_delay_or_raise(exc, attempt, max_retries, deadline)
             time.sleep(sleep_for)
 
         raise HTTPException(status_code=502, detail="Vertex AI request failed after retries")
 
+    async def _apost_with_retry(
+        self,
+        *,
+        url: str,
+        body: bytes,
+        token: str,
+        timeout: float,
+        max_retries: int = 2,
+        retry_budget: float = 30.0,
+    ) -> httpx.Response:
+        # body is serialized once by the caller; every retry resends the same bytes
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        # cumulative backoff (including Retry-After waits) must fit inside retry_budget seconds
+        deadline = time.monotonic() + retry_budget
+        for attempt in range(max_retries + 1):
+            try:
+                resp = await self._ahttp().post(
+                    url,
+                    content=body,
+                    headers=headers,
+                    timeout=httpx.Timeout(timeout, connect=min(10.0, timeout)),
+                )
+                resp.raise_for_status()
+                return resp
+            except httpx.HTTPError as exc:  # noqa: BLE001
+                sleep_for = self._retry_delay_or_raise(exc, attempt, max_retries, deadline)
+            await asyncio.sleep(sleep_for)
+
+        raise HTTPException(status_code=502, detail="Vertex AI request failed after retries")
+
+    @staticmethod
+    def _retry_delay_or_raise(
+        exc: httpx.HTTPError, attempt: int, max_retries: int, deadline: float
+    ) -> float:
+        """Shared retry policy: raise HTTPException when final, else return the backoff seconds."""
+        retry_after: Optional[float] = None
+        if isinstance(exc, httpx.HTTPStatusError):
+            status_code = exc.response.status_code if exc.response is not None else 502
+            body = exc.response.text if exc.response is not None else str(exc)
+            logger.error("Vertex request failed (%s): %s", status_code, body)
+            error = HTTPException(status_code=status_code, detail=body)
+            is_retryable = status_code in {408, 429, 500, 502, 503, 504}
+            if not is_retryable or attempt == max_retries:
+                raise error
+            retry_after = _retry_after_seconds(exc.response)
+        else:
+            logger.warning("Vertex transport error: %s", exc)
+            error = HTTPException(status_code=502, detail=str(exc))
+            if attempt == max_retries:
+                raise error
+
+        # server hint wins; otherwise linear backoff plus jitter so workers don't retry in lockstep
+        if retry_after is not None:
+            sleep_for = retry_after
+        else:
+            sleep_for = min(2.0 * (attempt + 1), 5.0) + random.uniform(0, 0.5 * (attempt + 1))
+        if time.monotonic() + sleep_for > deadline:
+            logger.warning("Vertex retry wait %.1fs exceeds the retry budget; giving up", sleep_for)
+            raise error
+        logger.warning("Vertex video request retry %s/%s due to %s", attempt + 1, max_retries, exc)
+        return sleep_for
+
     def start_generation(
         self,
         *,
@@ -267,116 +575,125 @@ class VertexVideoService:
         image_data: str,
         mime_type: str,
         parameters: Optional[Dict[str, Any]] = None,
+        trusted_parameters: bool = False,
     ) -> Dict[str, Any]:
-        project_id = _get_env("VERTEX_PROJECT_ID")
-        location_id = _get_env("VERTEX_LOCATION", "us-central1")
-        model_id = _get_env("VERTEX_MODEL_ID", "veo-3.0-generate-001")
-        api_endpoint = os.getenv("VERTEX_API_ENDPOINT", f"{location_id}-aiplatform.googleapis.com")
-
+        url = _predict_url()
         token = self._get_access_token()
-        url = (
-            f"https://{api_endpoint}/v1/projects/{project_id}/locations/{location_id}/"
-            f"publishers/google/models/{model_id}:predictLongRunning"
-        )
 
         last_error: Optional[HTTPException] = None
-        for payload in self._build_payload_variants(
+        for variant, payload in self._build_payload_variants(
             prompt=prompt,
             image_data=image_data,
             mime_type=mime_type,
             parameters=parameters,
+            trusted_parameters=trusted_parameters,
         ):
             try:
-                resp = self._post_with_retry(url=url, payload=payload, token=token, timeout=120.0)
-                return resp.json()
+                resp = self._post_with_retry(url=url, body=_dumps(payload), token=token, timeout=120.0)
             except HTTPException as exc:
                 if 400 <= exc.status_code < 500:
+                    self._record_variant(variant, accepted=False)
                     last_error = exc
                     continue
                 raise
+            self._record_variant(variant, accepted=True)
+            return _loads(resp.content)
         if last_error:
             raise last_error
         raise HTTPException(status_code=502, detail="Vertex request failed for all payload variants")
 
     def fetch_operation(self, *, operation_name: str) -> Dict[str, Any]:
-        project_id = _get_env("VERTEX_PROJECT_ID")
-        location_id = _get_env("VERTEX_LOCATION", "us-central1")
-        model_id = _get_env("VERTEX_MODEL_ID", "veo-3.0-fast-generate-001")
-        api_endpoint = os.getenv("VERTEX_API_ENDPOINT", f"{location_id}-aiplatform.googleapis.com")
-
+        url = _fetch_url()
         payload = {"operationName": operation_name}
         token = self._get_access_token()
-        url = (
-            f"https://{api_endpoint}/v1/projects/{project_id}/locations/{location_id}/"
-            f"publishers/google/models/{model_id}:fetchPredictOperation"
-        )
 
-        resp = self._post_with_retry(url=url, payload=payload, token=token, timeout=30.0)
-        return resp.json()
+        resp = self._post_with_retry(url=url, body=_dumps(payload), token=token, timeout=30.0)
+        return _loads(resp.content)
+
+    async def astart_generation(
+        self,
+        *,
+        prompt: str,
+        image_data: str,
+        mime_type: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        trusted_parameters: bool = False,
+    ) -> Dict[str, Any]:
+        url = _predict_url()
+        token = await self._aget_access_token()
+
+        last_error: Optional[HTTPException] = None
+        for variant, payload in self._build_payload_variants(
+            prompt=prompt,
+            image_data=image_data,
+            mime_type=mime_type,
+            parameters=parameters,
+            trusted_parameters=trusted_parameters,
+        ):
+            try:
+                # the payload carries the multi-MB base64 image: encode off the event loop
+                body = await asyncio.to_thread(_dumps, payload)
+                resp = await self._apost_with_retry(url=url, body=body, token=token, timeout=120.0)
+            except HTTPException as exc:
+                if 400 <= exc.status_code < 500:
+                    self._record_variant(variant, accepted=False)
+                    last_error = exc
+                    continue
+                raise
+            self._record_variant(variant, accepted=True)
+            return await asyncio.to_thread(_loads, resp.content)
+        if last_error:
+            raise last_error
+        raise HTTPException(status_code=502, detail="Vertex request failed for all payload variants")
+
+    async def afetch_operation(self, *, operation_name: str) -> Dict[str, Any]:
+        url = _fetch_url()
+        payload = {"operationName": operation_name}
+        token = await self._aget_access_token()
+
+        resp = await self._apost_with_retry(url=url, body=_dumps(payload), token=token, timeout=30.0)
+        # finished operations may inline base64 videos; parse off the event loop
+        return await asyncio.to_thread(_loads, resp.content)
+
+    async def await_operation(
+        self,
+        *,
+        operation_name: str,
+        timeout: float = 600.0,
+        base_delay: float = 2.0,
+        max_delay: float = 15.0,
+    ) -> Dict[str, Any]:
+        """
+        Poll afetch_operation until the operation reports done, backing off exponentially
+        (x1.6 with up to 20% jitter, capped at max_delay) over the shared AsyncClient.
+        Raises HTTPException(504) once `timeout` seconds pass; cancellation propagates.
+        """
+        deadline = time.monotonic() + timeout
+        delay = base_delay
+        while True:
+            response = await self.afetch_operation(operation_name=operation_name)
+            operation = response.get("operation", response)
+            if isinstance(operation, dict) and operation.get("done"):
+                return response
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail="Timed out waiting for Vertex AI operation")
+            await asyncio.sleep(min(remaining, delay + random.uniform(0, delay * 0.2)))
+            delay = min(delay * 1.6, max_delay)
 
     @staticmethod
     def collect_video_uris(operation: Dict[str, Any]) -> List[str]:
-        uris: List[str] = []
         op = operation.get("operation", operation) if isinstance(operation, dict) else {}
-        response = op.get("response", {}) if isinstance(op, dict) else {}
-        predictions = response.get("predictions") or (op.get("predictions") if isinstance(op, dict) else [])
-        if not isinstance(predictions, list):
-            return uris
-        for pred in predictions:
-            if not isinstance(pred, dict):
-                continue
-            candidates = [
-                pred.get("videoUri"),
-                pred.get("video_uri"),
-                pred.get("outputUri"),
-                pred.get("output_uri"),
-            ]
-            for val in candidates:
-                if isinstance(val, str) and val:
-                    uris.append(val)
-            for key in ("videoUris", "video_uris"):
-                val = pred.get(key)
-                if isinstance(val, list):
-                    uris.extend([v for v in val if isinstance(v, str)])
-            for key in ("videos", "generatedVideos"):
-                val = pred.get(key)
-                if isinstance(val, list):
-                    for item in val:
-                        if isinstance(item, dict):
-                            for k in ("uri", "gcsUri", "videoUri"):
-                                maybe = item.get(k)
-                                if isinstance(maybe, str) and maybe:
-                                    uris.append(maybe)
-
-        if isinstance(response, dict):
-            content = response.get('content') or []
-            if isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict):
-                        media = item.get('media') or item.get('video')
-                        if isinstance(media, dict):
-                            for k in ('uri','gcsUri','videoUri'):
-                                v = media.get(k)
-                                if isinstance(v, str) and v:
-                                    uris.append(v)
-            for k in ('videoUri','video_uri','outputUri','output_uri'):
-                v = response.get(k)
-                if isinstance(v, str) and v:
-                    uris.append(v)
-                # Official schema: response.generatedSamples[].video.uri
+        if not isinstance(op, dict):
+            return []
+        response = op.get("response")
+        roots: List[Any] = []
         if isinstance(response, dict):
-            samples = response.get("generatedSamples") or response.get("generated_samples") or []
-            if isinstance(samples, list):
-                for s in samples:
-                    if isinstance(s, dict):
-                        vid = s.get("video") or s.get("Video") or s.get("media")
-                        if isinstance(vid, dict):
-                            for k in ("uri", "gcsUri", "videoUri"):
-                                v = vid.get(k)
-                                if isinstance(v, str) and v:
-                                    uris.append(v)
-        return list(dict.fromkeys(uris))
-
+            roots.append(response)
+        if not (isinstance(response, dict) and response.get("predictions")):
+            roots.append(op.get("predictions"))
+        # predictions[], content[].media, generatedSamples[].video and response-level keys in one pass
+        return list(dict.fromkeys(uri for root in roots for uri in _walk_uris(root)))
 
 vertex_video_service = VertexVideoService()
 
@@ -5,6 +5,27 @@
 from typing import Dict, Any, Tuple, List
 
 
+def _classify(item: Dict[str, Any]) -> Tuple[bool, bool]:
+    """
+    (외부 여부, 내부 여부)를 한 번에 계산 - 키마다 .get 한 번씩만 수행
+    """
+    is_external = item.get("isExternal")
+    pos = item.get("pos")
+    item_id = item.get("id")
+    external = is_external is True or bool(not pos and not item_id and item.get("base64"))
+    internal = pos is not None or bool(item_id and not is_external)
+    return external, internal
+
+
+# (외부 여부, 내부 여부) -> 슬롯 타입 (외부 조건이 우선)
+_SLOT_TYPES = {
+    (True, False): "external",
+    (True, True): "external",
+    (False, True): "internal",
+    (False, False): "unknown",
+}
+
+
 def is_external_slot(item: Dict[str, Any]) -> bool:
     """
     슬롯 아이템이 외부 데이터인지 확인
@@ -17,15 +38,7 @@ def is_external_slot(item: Dict[str, Any]) -> bool:
     """
     if not item:
         return False
-    
-    # 외부 데이터 조건
-    if item.get("isExternal") is True:
-        return True
-    
-    if item.get("base64") and not item.get("pos") and not item.get("id"):
-        return True
-    
-    return False
+    return _classify(item)[0]
 
 
 def is_internal_slot(item: Dict[str, Any]) -> bool:
@@ -40,15 +53,7 @@ def is_internal_slot(item: Dict[str, Any]) -> bool:
     """
     if not item:
         return False
-    
-    # 내부 데이터 조건
-    if item.get("pos") is not None:
-        return True
-    
-    if item.get("id") and not item.get("isExternal"):
-        return True
-    
-    return False
+    return _classify(item)[1]
 
 
 def categorize_slots(clothing_items: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
@@ -61,16 +66,18 @@ def categorize_slots(clothing_items: Dict[str, Any]) -> Tuple[Dict[str, Any], Di
     Returns:
         Tuple[Dict, Dict]: (내부_슬롯들, 외부_슬롯들)
     """
-    internal_slots = {}
-    external_slots = {}
-    
+    internal_slots: Dict[str, Any] = {}
+    external_slots: Dict[str, Any] = {}
+    classify = _classify  # 루프 안에서 전역 조회 대신 지역 변수로 바인딩
+
     for slot_name, item in clothing_items.items():
         if not item:
             continue
-            
-        if is_external_slot(item):
+
+        external, internal = classify(item)
+        if external:
             external_slots[slot_name] = item
-        elif is_internal_slot(item):
+        elif internal:
             internal_slots[slot_name] = item
     
     return internal_slots, external_slots
@@ -88,13 +95,7 @@ def get_slot_type(item: Dict[str, Any]) -> str:
     """
     if not item:
         return "empty"
-    
-    if is_external_slot(item):
-        return "external"
-    elif is_internal_slot(item):
-        return "internal"
-    else:
-        return "unknown"
+    return _SLOT_TYPES[_classify(item)]
 
 
 def validate_slot_data(item: Dict[str, Any], slot_type: str) -> bool:
@@ -0,0 +1,301 @@
+import gc
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import uuid
+import weakref
+from pathlib import Path
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services import db_recommender as dbr
+from app.services.db_recommender import DbConfig, DbPosRecommender, _CatalogState, _CopyMatrixSink
+
+_LOGGER = logging.getLogger("test_db_recommender")
+_CATEGORIES = ("top", "pants", "shoes", "outer")
+
+
+def _state(n: int, dim: int, seed: int = 0) -> _CatalogState:
+    rng = np.random.default_rng(seed)
+    emb = rng.standard_normal((n, dim)).astype(np.float32)
+    emb_norm = np.ascontiguousarray(emb / np.linalg.norm(emb, axis=1, keepdims=True), dtype=np.float32)
+    prices = rng.integers(1000, 100000, n).astype(np.float32)
+    products = [
+        {"id": str(i), "pos": i, "price": int(prices[i]), "category": _CATEGORIES[i % 4], "tags": ["t"]}
+        for i in range(n)
+    ]
+    return _CatalogState(
+        products=products,
+        emb=emb,
+        emb_norm=emb_norm,
+        prices=prices,
+        clog=np.log1p(prices).astype(np.float32),
+        qlog_mean=float(np.log1p(prices.mean())),
+        categories=np.array([p["category"] for p in products]),
+        ann=None,
+        emb_gpu=None,
+        version=(n - 1, n),
+        generation=1,
+    )
+
+
+def _recommender(st: _CatalogState) -> DbPosRecommender:
+    # empty host/user: no engine, nothing is loaded from a DB
+    rec = DbPosRecommender(DbConfig(host="", user=""))
+    rec._state = st
+    return rec
+
+
+def _reference_scores(st: _CatalogState, q: np.ndarray, alpha=0.38, w1=0.97, w2=0.03) -> np.ndarray:
+    emb = st.emb_norm.astype(np.float64)
+    sim = emb @ q.astype(np.float64)
+    price = np.exp(-alpha * np.abs(st.clog.astype(np.float64) - st.qlog_mean))
+    return w1 * sim + w2 * price
+
+
+def _query(st: _CatalogState, positions) -> np.ndarray:
+    q = st.emb_norm[positions].astype(np.float64).mean(axis=0)
+    return q / np.linalg.norm(q)
+
+
+def _reference_top(st: _CatalogState, positions, k: int, **weights):
+    total = _reference_scores(st, _query(st, positions), **weights)
+    total[positions] = -np.inf
+    top = np.argsort(-total, kind="stable")[:k]
+    return [str(i) for i in top], total[top]
+
+
+class ScoringPathTests(unittest.TestCase):
+    N, DIM = 300, 24
+
+    def setUp(self) -> None:
+        self.st = _state(self.N, self.DIM)
+        self.rec = _recommender(self.st)
+        self.q = _query(self.st, [4, 9])
+
+    def _scores(self, st: _CatalogState, **weights) -> np.ndarray:
+        return self.rec._calculate_similarity_scores(st, self.q.astype(np.float32), **weights).copy()
+
+    def test_numba_kernel_matches_reference(self) -> None:
+        if dbr._fused_score_kernel is None:
+            self.skipTest("numba not installed")
+        weights = dict(alpha=0.7, w1=0.6, w2=0.4)
+        expected = _reference_scores(self.st, self.q, **weights)
+        with mock.patch.object(dbr, "_USE_NUMBA", True):
+            np.testing.assert_allclose(self._scores(self.st, **weights), expected, atol=1e-5)
+            # shared-memory / mmap views are read-only: the second compiled signature
+            emb_ro = self.st.emb_norm.copy()
+            emb_ro.flags.writeable = False
+            st_ro = _CatalogState(**{**self.st.__dict__, "emb_norm": emb_ro})
+            np.testing.assert_allclose(self._scores(st_ro, **weights), expected, atol=1e-5)
+
+    def test_matvec_path_matches_reference(self) -> None:
+        expected = _reference_scores(self.st, self.q)
+        with mock.patch.object(dbr, "_USE_NUMBA", False):
+            np.testing.assert_allclose(self._scores(self.st), expected, atol=1e-5)
+            with mock.patch.object(dbr, "_sgemv", None):
+                np.testing.assert_allclose(self._scores(self.st), expected, atol=1e-5)
+
+    def test_matvec_sgemv_and_matmul_agree(self) -> None:
+        vec = self.q.astype(np.float32)
+        expected = self.st.emb_norm.astype(np.float64) @ self.q
+        out = np.empty(self.N, dtype=np.float32)
+        res = dbr._matvec(self.st.emb_norm, vec, out=out)
+        np.testing.assert_allclose(res, expected, atol=1e-5)
+        np.testing.assert_allclose(out, expected, atol=1e-5)  # written in place
+        np.testing.assert_allclose(dbr._matvec(self.st.emb_norm, vec), expected, atol=1e-5)
+        with mock.patch.object(dbr, "_sgemv", None):
+            np.testing.assert_allclose(dbr._matvec(self.st.emb_norm, vec), expected, atol=1e-5)
+
+    def test_recommend_full_scan_matches_reference(self) -> None:
+        positions = [3, 17, 42]
+        expected_ids, expected_scores = _reference_top(self.st, positions, 10)
+        for use_numba in (False, dbr._fused_score_kernel is not None):
+            with self.subTest(numba=use_numba), mock.patch.object(dbr, "_USE_NUMBA", use_numba):
+                rec = _recommender(self.st)
+                got = rec.recommend(positions, top_k=10)
+                self.assertEqual([r["id"] for r in got], expected_ids)
+                np.testing.assert_allclose([r["score"] for r in got], expected_scores, atol=1e-5)
+
+    def test_recommend_by_embedding_filters_category(self) -> None:
+        raw = self.st.emb[11] * 3.0  # unnormalized input
+        got = self.rec.recommend_by_embedding(raw.tolist(), category="shoes", top_k=5)
+        total = _reference_scores(self.st, raw / np.linalg.norm(raw))
+        total[self.st.categories != "shoes"] = -np.inf
+        self.assertEqual([r["id"] for r in got], [str(i) for i in np.argsort(-total, kind="stable")[:5]])
+        self.assertTrue(all(r["category"] == "shoes" for r in got))
+        self.assertEqual(self.rec.recommend_by_embedding(raw.tolist(), category="hats"), [])
+
+    def test_ann_candidates_match_reference(self) -> None:
+        if dbr.hnswlib is None:
+            self.skipTest("hnswlib not installed")
+        with mock.patch.dict(os.environ, {"USE_ANN": "1"}):
+            ann = self.rec._build_ann_index(self.st.emb_norm)
+        self.assertIsNotNone(ann)
+        st = _CatalogState(**{**self.st.__dict__, "ann": ann})
+        positions = [5, 6]
+        # k * 40 candidates cover the whole catalog here, so the rerank must equal the exact answer
+        expected_ids, expected_scores = _reference_top(st, positions, 8)
+        got = _recommender(st).recommend(positions, top_k=8)
+        self.assertEqual([r["id"] for r in got], expected_ids)
+        np.testing.assert_allclose([r["score"] for r in got], expected_scores, atol=1e-5)
+
+    def test_cached_results_are_detached_and_keyed_by_generation(self) -> None:
+        first = self.rec.recommend([1, 2], top_k=3)
+        first[0]["tags"].append("mutated")
+        second = self.rec.recommend([2, 1], top_k=3)
+        self.assertEqual([r["id"] for r in first], [r["id"] for r in second])
+        self.assertEqual(second[0]["tags"], ["t"])
+        # a republished state with the same version must not be served from the old entry
+        other = _state(self.N, self.DIM, seed=1)
+        self.rec._state = _CatalogState(**{**other.__dict__, "generation": 2})
+        expected_ids, _ = _reference_top(self.rec._state, [1, 2], 3)
+        self.assertEqual([r["id"] for r in self.rec.recommend([1, 2], top_k=3)], expected_ids)
+
+
+def _pgcopy(rows: np.ndarray, wire: str, *, extension: bytes = b"", null_at=None) -> bytes:
+    width = np.dtype(wire).itemsize
+    out = bytearray(dbr._PGCOPY_SIGNATURE)
+    out += struct.pack(">ii", 0, len(extension)) + extension
+    for r, row in enumerate(rows):
+        out += struct.pack(">h", row.shape[0])
+        for c, value in enumerate(row):
+            if null_at == (r, c):
+                out += struct.pack(">i", -1)
+            else:
+                out += struct.pack(">i", width) + np.array(value, dtype=wire).tobytes()
+    return bytes(out + dbr._PGCOPY_TRAILER)
+
+
+class CopyMatrixSinkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rows = np.random.default_rng(2).standard_normal((37, 5)).astype(np.float32)
+
+    def _feed(self, sink: _CopyMatrixSink, data: bytes, chunk: int) -> np.ndarray:
+        for i in range(0, len(data), chunk):
+            sink.write(data[i:i + chunk])
+        return sink.finish()
+
+    def test_parses_real_columns_across_chunk_boundaries(self) -> None:
+        data = _pgcopy(self.rows, ">f4", extension=b"\x00\x01\x02\x03")
+        for chunk in (1, 7, 64, len(data)):
+            with self.subTest(chunk=chunk):
+                mat = self._feed(_CopyMatrixSink(37, 5, ">f4", flush_bytes=16), data, chunk)
+                np.testing.assert_array_equal(mat, self.rows)
+
+    def test_double_precision_and_rows_beyond_count(self) -> None:
+        rows64 = self.rows.astype(np.float64)
+        # COUNT(*) ran before more rows were inserted: the matrix grows instead of dropping them
+        mat = self._feed(_CopyMatrixSink(10, 5, ">f8", flush_bytes=32), _pgcopy(rows64, ">f8"), 50)
+        self.assertEqual(mat.dtype, np.float32)
+        np.testing.assert_array_equal(mat, rows64.astype(np.float32))
+
+    def test_rejects_null_cell(self) -> None:
+        sink = _CopyMatrixSink(37, 5, ">f4")
+        with self.assertRaises(ValueError):
+            self._feed(sink, _pgcopy(self.rows, ">f4", null_at=(3, 2)), 1 << 20)
+
+    def test_rejects_truncated_stream_and_bad_signature(self) -> None:
+        data = _pgcopy(self.rows, ">f4")
+        with self.assertRaises(ValueError):
+            self._feed(_CopyMatrixSink(37, 5, ">f4"), data[:-2], 1 << 20)
+        with self.assertRaises(ValueError):
+            self._feed(_CopyMatrixSink(37, 5, ">f4"), data[:-30], 1 << 20)
+        with self.assertRaises(ValueError):
+            self._feed(_CopyMatrixSink(37, 5, ">f4"), b"COPY" + data[4:], 1 << 20)
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = str(Path(self._tmp.name) / "emb_norm.npy")
+        self.st = _state(40, 8)
+        self.rec = _recommender(self.st)
+        self.rec.snapshot_path = self.path
+
+    def test_round_trip_memory_maps_matching_version(self) -> None:
+        self.assertTrue(self.rec.save_snapshot(self.path))
+        mat = self.rec._load_snapshot(self.st.version)
+        self.assertIsInstance(mat, np.memmap)
+        np.testing.assert_array_equal(mat, self.st.emb_norm)
+        self.assertEqual([p.name for p in Path(self._tmp.name).iterdir() if "tmp" in p.name], [])
+
+    def test_version_mismatch_or_missing_meta_returns_none(self) -> None:
+        self.rec.save_snapshot(self.path)
+        self.assertIsNone(self.rec._load_snapshot((self.st.version[0], self.st.version[1] + 1)))
+        self.assertIsNone(self.rec._load_snapshot((None, 0)))
+        os.remove(self.path + ".meta.json")
+        self.assertIsNone(self.rec._load_snapshot(self.st.version))
+
+    def test_corrupt_meta_or_wrong_dtype_returns_none(self) -> None:
+        self.rec.save_snapshot(self.path)
+        Path(self.path + ".meta.json").write_text("{not json", encoding="utf-8")
+        self.assertIsNone(self.rec._load_snapshot(self.st.version))
+        np.save(self.path, self.st.emb_norm.astype(np.float64))
+        Path(self.path + ".meta.json").write_text(json.dumps({"version": list(self.st.version)}), encoding="utf-8")
+        self.assertIsNone(self.rec._load_snapshot(self.st.version))
+
+
+class SharedMemoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.name = dbr._shm_block_name(f"lbtest_{uuid.uuid4().hex[:8]}", (99, 100))
+        self.mat = _state(100, 8).emb_norm
+
+    def tearDown(self) -> None:
+        gc.collect()
+        view, shm = dbr._attach_shared_matrix(self.name, _LOGGER, wait=0)
+        if shm is not None:
+            del view
+            shm.close()
+            shm.unlink()
+
+    def test_share_attach_and_retire(self) -> None:
+        view, shm, created = dbr._share_matrix(self.name, self.mat, _LOGGER)
+        self.assertTrue(created)
+        self.assertFalse(view.flags.writeable)
+        np.testing.assert_array_equal(view, self.mat)
+
+        # a second worker attaches to the same block instead of creating one
+        view2, shm2, created2 = dbr._share_matrix(self.name, self.mat, _LOGGER, wait=1)
+        self.assertFalse(created2)
+        np.testing.assert_array_equal(view2, self.mat)
+
+        # a block of another shape is not used
+        other, shm3, _ = dbr._share_matrix(self.name, self.mat[:10], _LOGGER, wait=1)
+        self.assertIsNone(shm3)
+        self.assertTrue(other.flags.writeable)  # the private matrix comes back
+
+        view3, shm4 = dbr._attach_shared_matrix(self.name, _LOGGER, wait=1)
+        np.testing.assert_array_equal(view3, self.mat)
+        del view3
+
+        rec = _recommender(_state(4, 2))
+        # an in-flight request still reads a row of the block while it is replaced
+        row = view2[3]
+        mapping = weakref.ref(view2.base)
+        del view, view2
+        rec._retire_shm(shm2, unlink=False)
+        rec._retire_shm(shm4, unlink=False)
+        rec._retire_shm(shm, unlink=True)
+        np.testing.assert_array_equal(row, self.mat[3])
+        # the creator unlinked the name, so new workers can no longer attach
+        self.assertEqual(dbr._attach_shared_matrix(self.name, _LOGGER, wait=0), (None, None))
+        # and the mapping goes away with the last view
+        del row
+        gc.collect()
+        self.assertIsNone(mapping())
+
+    def test_attach_missing_block(self) -> None:
+        self.assertEqual(dbr._attach_shared_matrix(self.name, _LOGGER, wait=0), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
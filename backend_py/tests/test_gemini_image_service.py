@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+import unittest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services.gemini_image_service import GeminiImageService
+
+
+class _FakeLegacySdk:
+    """google.generativeai stand-in: configure() is process-global, models bind the default client lazily."""
+
+    def __init__(self) -> None:
+        self.api_key = None
+        self.clients = {}
+        sdk = self
+
+        class GenerativeModel:
+            def __init__(self, name: str) -> None:
+                self.name = name
+                self._client = None
+
+            def generate_content(self, *args, **kwargs):
+                if self._client is None:
+                    self._client = sdk.get_default_generative_client()
+                return self._client.api_key
+
+        self.GenerativeModel = GenerativeModel
+
+    def configure(self, *, api_key: str) -> None:
+        self.api_key = api_key
+        self.clients = {}
+
+    def get_default_generative_client(self):
+        if "generative" not in self.clients:
+            self.clients["generative"] = SimpleNamespace(api_key=self.api_key)
+        return self.clients["generative"]
+
+
+class LegacyModelCacheTests(unittest.TestCase):
+    def test_cached_models_keep_their_own_keys(self) -> None:
+        service = GeminiImageService()
+        sdk = _FakeLegacySdk()
+        service._legacy_genai = sdk
+        service._legacy_client = sdk
+        service._max_clients = 2
+
+        model_a = service._get_legacy_model("key-a")
+        # key B is configured before model A is ever used
+        model_b = service._get_legacy_model("key-b")
+
+        self.assertEqual(model_a.generate_content("hi"), "key-a")
+        self.assertEqual(model_b.generate_content("hi"), "key-b")
+        self.assertIs(service._get_legacy_model("key-a"), model_a)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services import pos_recommender as pr
+
+
+class _FakeCatalog:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def get_all(self):
+        return self._rows
+
+
+def _catalog(n: int, rng: np.random.Generator):
+    prices = np.rint(np.exp(rng.normal(10.5, 0.8, size=n)))
+    return [
+        {"id": f"p{i}", "title": f"item {i}", "price": int(price), "tags": ["t"], "category": "top"}
+        for i, price in enumerate(prices)
+    ]
+
+
+class PriceWindowTests(unittest.TestCase):
+    # half-width is at least _PRICE_WINDOW_MIN (2000) rows and must fit in a quarter of the catalog
+    N = 20000
+    DIM = 32
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        rng = np.random.default_rng(7)
+        path = Path(self._tmp.name) / "embeddings.npy"
+        np.save(path, rng.standard_normal((self.N, self.DIM)).astype(np.float32))
+        catalog = _FakeCatalog(_catalog(self.N, rng))
+        with mock.patch.dict(os.environ, {"POS_REC_EMBEDDINGS_PATH": str(path)}), mock.patch.object(
+            pr, "get_catalog_service", return_value=catalog
+        ):
+            self.rec = pr.PosRecommender()
+        self.assertTrue(self.rec.available())
+        self.rng = rng
+
+    def _compare(self) -> int:
+        hits = []
+        window = self.rec._price_window_top_k
+
+        def recording_window(*args):
+            result = window(*args)
+            hits.append(result is not None)
+            return result
+
+        for _ in range(40):
+            positions = self.rng.integers(0, self.N, size=int(self.rng.integers(1, 4))).tolist()
+            # price-dominated weights (w1 <= w2), the only case the window is tried for
+            kwargs = dict(top_k=int(self.rng.integers(1, 20)), alpha=5.0, w1=0.1, w2=0.7)
+            with mock.patch.object(self.rec, "_price_window_top_k", side_effect=recording_window):
+                got = self.rec.recommend(positions, **kwargs)
+            with mock.patch.object(pr, "_PRICE_WINDOW_MIN", 10**9):
+                full = self.rec.recommend(positions, **kwargs)
+            self.assertEqual([r["id"] for r in got], [r["id"] for r in full])
+            self.assertEqual([r["score"] for r in got], [r["score"] for r in full])
+        return sum(hits)
+
+    def test_window_matches_full_scan_numba(self) -> None:
+        if pr._fused_score_kernel is None:
+            self.skipTest("numba not installed")
+        with mock.patch.dict(os.environ, {"POS_REC_NUMBA": "1"}):
+            self.assertGreater(self._compare(), 0)
+
+    def test_window_matches_full_scan_numpy(self) -> None:
+        with mock.patch.dict(os.environ, {"POS_REC_NUMBA": "0"}):
+            self.assertGreater(self._compare(), 0)
+
+
+class NormCacheTests(unittest.TestCase):
+    N = 50
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        rng = np.random.default_rng(3)
+        self.path = Path(self._tmp.name) / "embeddings.npy"
+        np.save(self.path, rng.standard_normal((self.N, 8)).astype(np.float32))
+        self.catalog = _FakeCatalog(_catalog(self.N, rng))
+        env = mock.patch.dict(
+            os.environ, {"POS_REC_EMBEDDINGS_PATH": str(self.path), "POS_REC_INT8": "0", "POS_REC_FP16": "0"}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def _load(self, catalog=None):
+        hashes = []
+        source_sha1 = pr.PosRecommender._source_sha1
+
+        def counting_sha1(rec):
+            hashes.append(1)
+            return source_sha1(rec)
+
+        with mock.patch.object(pr, "get_catalog_service", return_value=catalog or self.catalog), mock.patch.object(
+            pr.PosRecommender, "_source_sha1", counting_sha1
+        ):
+            rec = pr.PosRecommender()
+        return rec, len(hashes)
+
+    def test_unchanged_source_is_not_rehashed(self) -> None:
+        first, hashed = self._load()
+        self.assertEqual(hashed, 1)  # cache built
+        second, hashed = self._load()
+        self.assertEqual(hashed, 0)
+        self.assertIsInstance(second._emb_norm, np.memmap)
+        np.testing.assert_array_equal(np.asarray(second._emb_norm), np.asarray(first._emb_norm))
+
+    def test_touched_source_falls_back_to_hash(self) -> None:
+        self._load()
+        st = self.path.stat()
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        rec, hashed = self._load()
+        self.assertEqual(hashed, 1)
+        self.assertIsInstance(rec._emb_norm, np.memmap)  # same content: cache reused
+        _, hashed = self._load()
+        self.assertEqual(hashed, 0)  # new mtime recorded
+
+    def test_failed_load_clears_price_index(self) -> None:
+        rec, _ = self._load()
+        self.assertIsNotNone(rec._price_order)
+
+        class _BrokenCatalog:
+            def get_all(self):
+                raise RuntimeError("catalog unavailable")
+
+        with mock.patch.object(pr, "get_catalog_service", return_value=_BrokenCatalog()):
+            rec._load_if_available()
+        self.assertFalse(rec.available())
+        self.assertIsNone(rec._price_order)
+        self.assertIsNone(rec._sorted_log_prices)
+        self.assertEqual(rec._catalog_rows, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
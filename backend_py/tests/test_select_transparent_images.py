@@ -0,0 +1,87 @@
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from tools.select_transparent_images import (
+    _load_cache,
+    _save_cache,
+    is_transparent_background,
+)
+
+
+def _rgba(alpha: np.ndarray) -> Image.Image:
+    h, w = alpha.shape
+    rgb = np.full((h, w, 3), 128, dtype=np.uint8)
+    return Image.fromarray(np.dstack([rgb, alpha.astype(np.uint8)]), "RGBA")
+
+
+def _cutout(w: int, h: int) -> Image.Image:
+    # 투명 배경 위 가운데 불투명 제품
+    alpha = np.zeros((h, w), dtype=np.uint8)
+    alpha[h // 4: 3 * h // 4, w // 4: 3 * w // 4] = 255
+    return _rgba(alpha)
+
+
+class IsTransparentBackgroundTests(unittest.TestCase):
+    def test_cutout_is_selected_in_both_modes(self) -> None:
+        im = _cutout(1200, 800)
+        full = is_transparent_background(im, max_side=0)
+        small = is_transparent_background(im, max_side=512)
+        self.assertEqual((full.ok, full.reason), (True, "ok"))
+        self.assertEqual((small.ok, small.reason), (True, "ok"))
+        # NEAREST 축소는 알파를 섞지 않으므로 비율이 거의 같음
+        self.assertAlmostEqual(full.transparent_ratio, 0.75, places=3)
+        self.assertAlmostEqual(small.transparent_ratio, full.transparent_ratio, delta=0.01)
+        self.assertEqual(small.border_mean_alpha, 0.0)
+
+    def test_reason_precedence_matches_original(self) -> None:
+        # 투명 픽셀이 없고 테두리도 불투명 → 기존 도구와 같이 투명 비율 사유가 우선
+        opaque = _rgba(np.full((700, 600), 255, dtype=np.uint8))
+        for max_side in (0, 512):
+            d = is_transparent_background(opaque, max_side=max_side)
+            self.assertEqual((d.ok, d.reason), (False, "transparent_ratio_too_low"))
+            self.assertEqual(d.transparent_ratio, 0.0)
+
+    def test_opaque_border_with_transparent_hole(self) -> None:
+        alpha = np.full((600, 600), 255, dtype=np.uint8)
+        alpha[200:400, 200:400] = 0  # 11% 투명하지만 테두리는 불투명
+        for max_side in (0, 512):
+            d = is_transparent_background(_rgba(alpha), max_side=max_side)
+            self.assertEqual((d.ok, d.reason), (False, "border_too_opaque"))
+            self.assertAlmostEqual(d.transparent_ratio, 1 / 9, delta=0.01)
+
+    def test_image_without_alpha_is_treated_as_opaque(self) -> None:
+        # RGB는 RGBA로 변환되어 알파가 전부 255 → 투명 비율 부족으로 탈락
+        d = is_transparent_background(Image.new("RGB", (32, 32), (255, 255, 255)))
+        self.assertEqual((d.ok, d.reason), (False, "transparent_ratio_too_low"))
+        self.assertEqual(d.border_mean_alpha, 255.0)
+
+
+class SelectionCacheTests(unittest.TestCase):
+    def test_cache_round_trip(self) -> None:
+        opts = {"min_transparent_ratio": 0.01, "max_side": 512, "rules": 2}
+        entries = {"/data/a.png": [123, 456, True, "ok", 0.5, 12.0]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "sub" / "cache.json"
+            _save_cache(path, opts, entries)
+            self.assertEqual(_load_cache(path, opts), entries)
+            # 판정 옵션이 다르면 캐시 전체를 무시
+            self.assertEqual(_load_cache(path, dict(opts, max_side=0)), {})
+            self.assertEqual([p.name for p in path.parent.iterdir()], ["cache.json"])
+
+    def test_missing_or_corrupt_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.json"
+            self.assertEqual(_load_cache(path, {}), {})
+            path.write_text("{not json", encoding="utf-8")
+            self.assertEqual(_load_cache(path, {}), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,22 @@
-﻿import sys
+﻿import asyncio
+import sys
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import unittest
+import unittest.mock
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+from app.routes import tryon_video
 from app.routes.tryon_video import _validate_base64_payload
-from app.services.vertex_video_service import VertexVideoService
+from app.services.vertex_video_service import VertexVideoService, _retry_after_seconds
 
 
 class VertexVideoServiceTests(unittest.TestCase):
@@ -38,12 +49,168 @@ class VertexVideoServiceTests(unittest.TestCase):
             ],
         )
 
+    def test_collect_video_uris_walks_nested_keys(self) -> None:
+        sample = {
+            "response": {
+                "generatedSamples": [{"video": {"uri": "gs://bucket/a.mp4"}}],
+                "content": [{"media": {"gcsUri": "gs://bucket/b.mp4"}}],
+                "videoUris": ["gs://bucket/c.mp4", "gs://bucket/a.mp4"],
+                "metadata": {"note": "not a uri", "uri": ""},
+            }
+        }
+        uris = self.service.collect_video_uris(sample)
+        self.assertEqual(uris, ["gs://bucket/a.mp4", "gs://bucket/b.mp4", "gs://bucket/c.mp4"])
+
+    def test_collect_video_uris_ignores_non_video_uris(self) -> None:
+        sample = {
+            "response": {
+                # input image echoed back ahead of the result
+                "instances": [{"image": {"gcsUri": "gs://bucket/person.png"}}],
+                "image": {"uri": "gs://bucket/person.png"},
+                "videos": [
+                    {"uri": "gs://bucket/thumb.png", "mimeType": "image/png"},
+                    {"gcsUri": "gs://bucket/out.mp4", "mimeType": "video/mp4"},
+                ],
+            }
+        }
+        self.assertEqual(self.service.collect_video_uris(sample), ["gs://bucket/out.mp4"])
+
+    def test_record_variant_orders_preferred_first(self) -> None:
+        def order(image_data="aGk="):
+            variants = self.service._build_payload_variants(  # type: ignore[attr-defined]
+                prompt="p", image_data=image_data, mime_type="image/png"
+            )
+            return [variant for variant, _ in variants]
+
+        self.assertEqual(order(), ["A", "B", "C"])
+        self.service._record_variant("B", True)  # type: ignore[attr-defined]
+        self.assertEqual(order(), ["B", "A", "C"])
+        # text-only C is never remembered, and image-less requests only ever send C
+        self.service._record_variant("C", True)  # type: ignore[attr-defined]
+        self.assertEqual(order(), ["B", "A", "C"])
+        self.assertEqual(order(image_data=None), ["C"])
+        # a rejection of the preferred shape resets to the default order
+        self.service._record_variant("B", False)  # type: ignore[attr-defined]
+        self.assertEqual(order(), ["A", "B", "C"])
+
+    def test_refresh_loop_does_not_spin_on_short_lived_tokens(self) -> None:
+        calls = []
+
+        def fake_refresh(service, *, force=False):
+            calls.append(force)
+            service._token_cache = ("token", time.time() + 60)  # lifetime below the 2-minute lead
+            return "token"
+
+        with unittest.mock.patch.object(VertexVideoService, "_refresh_token", fake_refresh):
+            thread = threading.Thread(target=self.service._refresh_loop, daemon=True)
+            thread.start()
+            time.sleep(0.2)
+            self.service._stop_refresh.set()
+            thread.join(timeout=2.0)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(calls, [True])
+
     def test_sanitize_parameters_converts_non_strings(self) -> None:
         params = {"durationSeconds": 4, "extra": None, "resolution": "720p"}
         cleaned = self.service._sanitize_parameters(params)  # type: ignore[attr-defined]
         self.assertEqual(cleaned, {"durationSeconds": "4", "resolution": "720p"})
 
 
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.com/predict")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def test_retry_after_delta_seconds(self) -> None:
+        self.assertEqual(_retry_after_seconds(httpx.Response(429, headers={"Retry-After": "7"})), 7.0)
+
+    def test_retry_after_http_date(self) -> None:
+        when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        wait = _retry_after_seconds(httpx.Response(503, headers={"Retry-After": when}))
+        self.assertIsNotNone(wait)
+        self.assertAlmostEqual(wait, 30.0, delta=2.0)
+        past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+        self.assertEqual(_retry_after_seconds(httpx.Response(503, headers={"Retry-After": past})), 0.0)
+
+    def test_retry_after_missing_or_garbage(self) -> None:
+        self.assertIsNone(_retry_after_seconds(None))
+        self.assertIsNone(_retry_after_seconds(httpx.Response(429)))
+        self.assertIsNone(_retry_after_seconds(httpx.Response(429, headers={"Retry-After": "soon"})))
+
+    def test_retry_delay_uses_retry_after_within_budget(self) -> None:
+        exc = _status_error(429, {"Retry-After": "3"})
+        delay = VertexVideoService._retry_delay_or_raise(exc, 0, 2, time.monotonic() + 30.0)
+        self.assertEqual(delay, 3.0)
+
+    def test_retry_delay_raises_when_budget_exhausted(self) -> None:
+        exc = _status_error(429, {"Retry-After": "10"})
+        with self.assertRaises(HTTPException) as ctx:
+            VertexVideoService._retry_delay_or_raise(exc, 0, 2, time.monotonic() + 1.0)
+        self.assertEqual(ctx.exception.status_code, 429)
+
+    def test_retry_delay_raises_on_final_or_non_retryable(self) -> None:
+        with self.assertRaises(HTTPException) as ctx:
+            VertexVideoService._retry_delay_or_raise(_status_error(400), 0, 2, time.monotonic() + 30.0)
+        self.assertEqual(ctx.exception.status_code, 400)
+        with self.assertRaises(HTTPException):
+            VertexVideoService._retry_delay_or_raise(_status_error(503), 2, 2, time.monotonic() + 30.0)
+
+
+class _FakeUpstream:
+    def __init__(self) -> None:
+        self.headers = {"Content-Type": "video/mp4", "Content-Length": "6"}
+        self.close_calls = 0
+
+    def iter_bytes(self, chunk_size: int = 65536):
+        yield b"abc"
+        yield b"def"
+
+    def close(self) -> None:
+        self.close_calls += 1
+
+
+class StreamVideoRouteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.upstream = _FakeUpstream()
+        # __slots__ instance: patch the class attribute
+        patcher = unittest.mock.patch.object(VertexVideoService, "open_uri_stream", return_value=self.upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = FastAPI()
+        self.app.include_router(tryon_video.router)
+
+    def test_stream_relays_body_and_closes_upstream(self) -> None:
+        with TestClient(self.app) as client:
+            resp = client.get("/api/try-on/video/stream", params={"uri": "gs://bucket/v.mp4"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b"abcdef")
+        self.assertGreaterEqual(self.upstream.close_calls, 1)
+
+    def test_upstream_closed_when_client_disconnects_before_body(self) -> None:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/try-on/video/stream", "raw_path": b"/api/try-on/video/stream",
+            "query_string": b"uri=gs://bucket/v.mp4", "headers": [], "server": ("test", 80),
+            "client": ("test", 1234), "root_path": "",
+        }
+
+        sent = []
+
+        async def receive():
+            return {"type": "http.disconnect"}  # client is already gone
+
+        async def send(message):
+            sent.append(message["type"])
+            if message["type"] == "http.response.start":
+                await asyncio.sleep(0.05)  # the disconnect cancels streaming before the relay starts
+
+        asyncio.run(self.app(scope, receive, send))
+        self.assertNotIn("http.response.body", sent)
+        self.assertEqual(self.upstream.close_calls, 1)
+
+
 class RouteHelpersTests(unittest.TestCase):
     def test_validate_base64_payload_rejects_invalid(self) -> None:
         with self.assertRaises(Exception):
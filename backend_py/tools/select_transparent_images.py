@@ -17,18 +17,29 @@ real_data 내 이미지 중 '배경 없는(투명 배경)' 파일만 선별해 
 - --dry-run: 결과만 출력하고 복사하지 않음
 - --min-transparent-ratio: 투명픽셀 비율 하한(기본 0.01 => 1%)
 - --border-ratio: 테두리 두께 비율(기본 0.04 => 4%)
+- --executor: 판정 병렬화 방식 process|thread (기본 process)
+- --workers: 판정 워커 수(기본 process=CPU 코어 수, thread=코어 수 x2, 1이면 순차 처리)
+- --max-side: 알파 통계 전 축소할 긴 변 길이(기본 512, 0이면 원본 해상도)
+- --cache: 판정 결과 캐시 JSON 경로. (mtime_ns, size)가 같은 파일은 다시 디코드하지 않음
+  (판정 옵션이 바뀌면 캐시 전체를 무시)
 
-필요 패키지: Pillow
+필요 패키지: Pillow, numpy
+(대량 처리 시 디코드가 2~3배 빠른 Pillow-SIMD 권장: tools/requirements-simd.txt 참고)
 """
 from __future__ import annotations
 
 import argparse
+import json
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, List, Tuple, Union
 
-from PIL import Image
+import numpy as np
+from PIL import Image, features
 
 
 def iter_files(root: Path, exts: Tuple[str, ...]) -> Iterable[Path]:
@@ -48,7 +59,8 @@ class Decision:
 def is_transparent_background(img: Image.Image, *,
                               min_transparent_ratio: float = 0.01,
                               border_ratio: float = 0.04,
-                              border_alpha_threshold: int = 245) -> Decision:
+                              border_alpha_threshold: int = 245,
+                              max_side: int = 512) -> Decision:
     if img.mode not in ("RGBA", "LA"):
         img = img.convert("RGBA")
 
@@ -57,39 +69,29 @@ def is_transparent_background(img: Image.Image, *,
 
     a = img.getchannel("A")
     w, h = a.size
-    pixels = a.load()
-
-    # 전체 투명 픽셀 비율
-    total = w * h
-    trans = 0
-    for y in range(h):
-        for x in range(w):
-            if pixels[x, y] <= 5:
-                trans += 1
-    transparent_ratio = trans / max(1, total)
+    # 임계값이 거친 비율/평균이라 축소본으로도 충분 (비율 기반이라 테두리 계산도 스케일 불변);
+    # NEAREST는 알파 값을 섞지 않는 표본 추출이라 투명 픽셀 비율이 편향되지 않음
+    if max_side and max(w, h) > max_side:
+        scale = max_side / max(w, h)
+        a = a.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.Resampling.NEAREST)
+        w, h = a.size
+    arr = np.asarray(a, dtype=np.uint8)  # (h, w)
 
     # 테두리 평균 알파(배경이 투명한 제품컷은 바깥 테두리가 대체로 낮음)
     bw = max(1, int(w * border_ratio))
     bh = max(1, int(h * border_ratio))
-    sums = 0
-    cnt = 0
-    # top
-    for y in range(0, bh):
-        for x in range(w):
-            sums += pixels[x, y]
-            cnt += 1
-    # bottom
-    for y in range(h - bh, h):
-        for x in range(w):
-            sums += pixels[x, y]
-            cnt += 1
-    # left + right (exclude corners already counted to keep simple ok)
-    for y in range(bh, h - bh):
-        for x in list(range(0, bw)) + list(range(w - bw, w)):
-            sums += pixels[x, y]
-            cnt += 1
+    # top, bottom, left + right (exclude corners already counted to keep simple ok)
+    strips = (arr[:bh], arr[h - bh:], arr[bh:h - bh, :bw], arr[bh:h - bh, w - bw:])
+    sums = sum(int(s.sum(dtype=np.int64)) for s in strips)
+    cnt = sum(s.size for s in strips)
     border_mean_alpha = sums / max(1, cnt)
 
+    # 전체 투명 픽셀 비율 (벡터화된 한 번의 패스라 테두리 판정 전에 계산해도 비용이 작음)
+    total = w * h
+    trans = int(np.count_nonzero(arr <= 5))
+    transparent_ratio = trans / max(1, total)
+
+    # 사유 우선순위는 기존과 동일: 투명 비율 부족 → 테두리 불투명
     if transparent_ratio < min_transparent_ratio:
         return Decision(False, "transparent_ratio_too_low", transparent_ratio, border_mean_alpha)
     if border_mean_alpha >= border_alpha_threshold:
@@ -98,6 +100,58 @@ def is_transparent_background(img: Image.Image, *,
     return Decision(True, "ok", transparent_ratio, border_mean_alpha)
 
 
+def _check(path: Path, **opts) -> Tuple[Path, Union[Decision, str]]:
+    """워커 프로세스에서 파일 하나를 열어 판정 (열기 실패 시 사유 문자열 반환)"""
+    try:
+        with Image.open(path) as im:
+            return path, is_transparent_background(im, **opts)
+    except Exception as e:
+        return path, f"open_failed:{e}"
+
+
+# entries: 절대경로 -> [mtime_ns, size, ok, reason, transparent_ratio, border_mean_alpha]
+CacheEntries = Dict[str, list]
+# 판정 규칙이 바뀌면 올림 → 이전 규칙으로 만든 캐시는 옵션 불일치로 무시됨
+CACHE_RULES_VERSION = 2
+
+
+def _load_cache(path: Path, options: dict) -> CacheEntries:
+    """판정 옵션이 같을 때만 이전 실행의 판정 결과를 재사용"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("options") != options:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def _save_cache(path: Path, options: dict, entries: CacheEntries) -> None:
+    # 임시 파일에 쓰고 교체 → 중단되어도 이전 캐시가 깨지지 않음
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"options": options, "entries": entries}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _copy(p: Path, in_root: Path, out_root: Path) -> None:
+    dest = out_root / p.relative_to(in_root)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(p, dest)
+
+
+def _log_decoder_info() -> None:
+    # Pillow-SIMD는 버전에 ".postN" 접미사가 붙음; 디코더 SIMD 백엔드 활성 여부를 한 줄로 출력
+    import PIL
+
+    version = getattr(PIL, "__version__", "?")
+    print(
+        f"[PIL] version={version} simd={'post' in version} "
+        f"libjpeg_turbo={features.check_feature('libjpeg_turbo')} webp={features.check('webp')}"
+    )
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Select images with transparent background")
     ap.add_argument("--input", "-i", type=str, required=True, help="입력 이미지 루트 폴더")
@@ -108,34 +162,85 @@ def main() -> int:
     ap.add_argument("--border-ratio", type=float, default=0.04, help="테두리 두께 비율 (기본 0.04)")
     ap.add_argument("--border-alpha-threshold", type=int, default=245, help="테두리 평균 알파 임계값 (기본 245)")
     ap.add_argument("--manifest", type=str, help="선별된 상대경로를 기록할 JSON 파일 경로")
+    ap.add_argument("--max-side", type=int, default=512, help="알파 통계 전 축소할 긴 변 길이 (기본 512, 0=원본)")
+    ap.add_argument("--cache", type=str, help="판정 결과 캐시 JSON 경로 (변경 없는 파일은 재판정 생략)")
+    ap.add_argument("--executor", choices=["process", "thread"], default="process",
+                    help="판정 병렬화 방식 (기본 process, thread는 fork/pickle 비용 없음)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="판정 워커 수 (기본 process=CPU 코어 수, thread=코어 수 x2)")
     args = ap.parse_args()
 
     in_root = Path(args.input).resolve()
     out_root = Path(args.output).resolve()
     out_root.mkdir(parents=True, exist_ok=True)
 
+    _log_decoder_info()
     exts = tuple(e.lower() if e.startswith('.') else f'.{e.lower()}' for e in args.extensions)
 
     ok_list: List[Path] = []
     skip_list: List[Tuple[Path, str]] = []
 
-    for path in iter_files(in_root, exts):
-        try:
-            with Image.open(path) as im:
-                d = is_transparent_background(
-                    im,
-                    min_transparent_ratio=args.min_transparent_ratio,
-                    border_ratio=args.border_ratio,
-                    border_alpha_threshold=args.border_alpha_threshold,
-                )
-        except Exception as e:
-            skip_list.append((path, f"open_failed:{e}"))
-            continue
+    opts = dict(
+        min_transparent_ratio=args.min_transparent_ratio,
+        border_ratio=args.border_ratio,
+        border_alpha_threshold=args.border_alpha_threshold,
+        max_side=args.max_side,
+    )
+    check = partial(_check, **opts)
+
+    def collect(results: Iterable[Tuple[Path, Union[Decision, str]]]) -> None:
+        for path, d in results:
+            if isinstance(d, str):
+                skip_list.append((path, d))
+            elif d.ok:
+                ok_list.append(path)
+            else:
+                skip_list.append((path, d.reason))
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers if args.workers is not None else (cpus * 2 if args.executor == "thread" else cpus)
 
-        if d.ok:
-            ok_list.append(path)
+    files = list(iter_files(in_root, exts))
+    cache_path = Path(args.cache).resolve() if args.cache else None
+    cache_opts = dict(opts, rules=CACHE_RULES_VERSION)
+    cached = _load_cache(cache_path, cache_opts) if cache_path else {}
+    entries: CacheEntries = {}
+    decisions: Dict[Path, Union[Decision, str]] = {}
+    todo: List[Path] = []
+    stats: Dict[Path, os.stat_result] = {}
+    for p in files:
+        if cache_path is None:
+            todo.append(p)
+            continue
+        st = stats[p] = p.stat()
+        hit = cached.get(str(p))
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            decisions[p] = Decision(*hit[2:])
+            entries[str(p)] = hit
         else:
-            skip_list.append((path, d.reason))
+            todo.append(p)
+    if cache_path is not None:
+        print(f"[CACHE] {len(files) - len(todo)} cached, {len(todo)} to check")
+
+    # 디코드 + 알파 분석은 CPU 바운드 → 워커로 분산
+    if workers <= 1 or len(todo) <= 1:
+        decisions.update(map(check, todo))
+    elif args.executor == "thread":
+        # Pillow 디코드/리사이즈와 NumPy 리덕션은 C 레벨에서 GIL을 놓으므로 스레드로도 확장됨
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            decisions.update(ex.map(check, todo))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            decisions.update(ex.map(check, todo, chunksize=16))
+    collect((p, decisions[p]) for p in files)  # 결과 순서는 파일 순서 유지
+
+    if cache_path is not None:
+        for p in todo:
+            d = decisions[p]
+            if isinstance(d, Decision):  # 열기 실패는 일시적일 수 있어 캐시하지 않음
+                st = stats[p]
+                entries[str(p)] = [st.st_mtime_ns, st.st_size, d.ok, d.reason, d.transparent_ratio, d.border_mean_alpha]
+        _save_cache(cache_path, cache_opts, entries)
 
     print(f"[SUMMARY] total={len(ok_list)+len(skip_list)} ok={len(ok_list)} skip={len(skip_list)}")
     for p, reason in skip_list[:10]:
@@ -149,11 +254,9 @@ def main() -> int:
         print(f"[MANIFEST] wrote {len(rels)} entries to {args.manifest}")
 
     if not args.dry_run:
-        for p in ok_list:
-            rel = p.relative_to(in_root)
-            dest = out_root / rel
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(p, dest)
+        # 복사는 I/O 바운드라 스레드로 충분
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            list(ex.map(partial(_copy, in_root=in_root, out_root=out_root), ok_list))
         print(f"[COPY] {len(ok_list)} files copied under {out_root}")
 
     return 0
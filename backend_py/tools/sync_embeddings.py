@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+DB 임베딩 -> .npy 스냅샷 동기화 스크립트
+
+용도
+- DbPosRecommender는 프로세스가 뜰 때마다 Postgres에서 임베딩 전체를 다시 읽음
+- 정규화된 float32 행렬을 .npy로 저장해 두면 DB_EMB_SNAPSHOT 경로를 mmap으로 로드
+  (DB 왕복 없음, uvicorn 워커들이 page cache 한 벌을 공유)
+- <output>.meta.json 에 상품 버전(max(pos), count(*))을 기록. DB 상품이 바뀌면 서버가
+  스냅샷을 무시하고 DB에서 읽으므로, 카탈로그 갱신 후 이 스크립트를 다시 실행하면 됨
+
+사용 예시(레포 루트 기준, DB_* 는 backend_py/.env 에서 읽음)
+    python backend_py/tools/sync_embeddings.py
+    python backend_py/tools/sync_embeddings.py --output /srv/data/db_embeddings.npy
+
+서버 설정(backend_py/.env)
+    DB_EMB_SNAPSHOT=/abs/path/to/data/db_embeddings.npy
+
+공유 메모리 프리로드(--shm)
+- 스냅샷 파일 없이, 워커들이 붙을 공유 메모리 블록을 미리 만들어 둠(uvicorn 기동 전에 1회 실행)
+- 워커는 DB_RECO_SHM_NAME 과 같은 이름의 블록이 있으면 임베딩을 DB에서 읽지 않고 바로 attach
+- 블록은 이 스크립트 종료 후에도 남음. 재부팅 또는 rm /dev/shm/<블록 이름> 으로 삭제
+    python backend_py/tools/sync_embeddings.py --shm lookbook_emb
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend_py"
+DEFAULT_OUTPUT = ROOT / "data" / "db_embeddings.npy"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Snapshot DB embeddings to a memory-mappable .npy")
+    ap.add_argument("--output", default=str(DEFAULT_OUTPUT), help="output .npy path")
+    ap.add_argument("--shm", default="", help="preload a shared-memory block for DB_RECO_SHM_NAME instead")
+    args = ap.parse_args()
+
+    # 항상 DB에서 새로 읽고(기존 스냅샷/공유 메모리 사용 안 함), 백그라운드 리프레시는 끔.
+    # .env 로드보다 먼저 설정해야 load_dotenv가 덮어쓰지 않음
+    os.environ["DB_EMB_SNAPSHOT"] = ""
+    os.environ["DB_RECO_SHM_NAME"] = ""
+    os.environ["DB_RECO_REFRESH_SECONDS"] = "0"
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app import settings  # noqa: F401  (.env 로드)
+    from app.services.db_recommender import _share_matrix, _shm_block_name, db_pos_recommender
+
+    if not db_pos_recommender.available():
+        print("[sync] DB recommender unavailable (check DB_* settings and server logs)", file=sys.stderr)
+        return 1
+
+    if args.shm:
+        name = _shm_block_name(args.shm, db_pos_recommender._version)
+        emb = db_pos_recommender.emb_norm
+        _, shm, created = _share_matrix(name, emb, db_pos_recommender.logger, persist=True)
+        if shm is None:
+            print(f"[sync] could not create shared block {name}", file=sys.stderr)
+            return 1
+        shm.close()
+        n, d = emb.shape  # type: ignore[union-attr]
+        print(f"[sync] {'created' if created else 'already present'}: /dev/shm/{name} ({n} x {d} float32)")
+        print(f"[sync] set DB_RECO_SHM_NAME={args.shm}")
+        return 0
+
+    out = Path(args.output).resolve()
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if not db_pos_recommender.save_snapshot(str(out)):
+        print("[sync] nothing to write", file=sys.stderr)
+        return 1
+    n, d = db_pos_recommender.emb_norm.shape  # type: ignore[union-attr]
+    print(f"[sync] wrote {out} ({n} x {d} float32)")
+    print(f"[sync] set DB_EMB_SNAPSHOT={out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
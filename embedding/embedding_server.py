@@ -3,14 +3,22 @@
 BAAI/bge-m3 모델을 사용한 텍스트 임베딩 서비스
 """
 import os
+import asyncio
 import logging
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
 import torch
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
 
+try:
+    import orjson  # type: ignore  # numpy 배열을 per-float 파이썬 객체 없이 직렬화
+except Exception:  # Optional dependency
+    orjson = None  # type: ignore
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,7 +45,19 @@ MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
 PREFERRED_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto").lower()  # auto|cuda|cpu
 BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "8"))
 MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "0"))  # 0이면 기본값 유지
+# CUDA에서 FP16 가중치 사용 (텐서 코어, 메모리 대역폭 절반)
+USE_FP16 = os.getenv("EMBEDDING_FP16", "true").lower() == "true"
+# /embed 마이크로 배칭: 동시 요청을 최대 BATCH_SIZE개까지 이 시간(ms) 동안 모아 한 번에 encode
+BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+# 추론 백엔드: torch(eager, 기본) | compile(torch.compile) | onnx(ONNX Runtime;
+# sentence-transformers>=3.2 + optimum[onnxruntime] 필요, 없으면 torch로 폴백)
+MODEL_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
 MODEL_DEVICE = "unknown"
+ACTIVE_BACKEND = "none"
+
+# 마이크로 배칭 상태 (startup에서 생성)
+_embed_queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+_batch_task: Optional[asyncio.Task] = None
 
 class EmbeddingRequest(BaseModel):
     text: str
@@ -53,21 +73,49 @@ class HealthResponse(BaseModel):
     model_name: str
     device: str
 
+def _build_model(device: str):
+    """EMBEDDING_BACKEND에 맞춰 모델 생성, (model, backend) 반환"""
+    if MODEL_BACKEND == "onnx":
+        try:
+            return SentenceTransformer(MODEL_NAME, device=device, backend="onnx"), "onnx"
+        except (TypeError, ImportError, ValueError) as e:
+            # 구버전 sentence-transformers(backend 인자 없음) 또는 optimum 미설치
+            logger.warning(f"ONNX backend unavailable ({e}). Using torch...")
+    return SentenceTransformer(MODEL_NAME, device=device), "torch"
+
+def _compile_model(model_local, device: str) -> bool:
+    """트랜스포머 본체만 torch.compile (토크나이저/풀링은 그대로), 실패 시 eager 유지"""
+    transformer = model_local[0]
+    eager = transformer.auto_model
+    try:
+        transformer.auto_model = torch.compile(
+            eager,
+            mode="reduce-overhead" if device == "cuda" else "default",
+            dynamic=True,  # 배치 크기/시퀀스 길이가 요청마다 달라 shape별 재컴파일 방지
+        )
+        # 컴파일은 첫 호출 때 일어나므로 첫 요청 대신 여기서 워밍업
+        model_local.encode(["warmup"], normalize_embeddings=True)
+        return True
+    except Exception as e:
+        logger.warning(f"torch.compile failed ({e}). Using eager model...")
+        transformer.auto_model = eager
+        return False
+
 def load_model():
     """모델 로드"""
-    global model, MODEL_DEVICE
+    global model, MODEL_DEVICE, ACTIVE_BACKEND
     try:
         # 디바이스 선택
         device = "cuda" if (PREFERRED_DEVICE in ["auto", "cuda"] and torch.cuda.is_available()) else "cpu"
-        logger.info(f"Loading {MODEL_NAME} model on {device}...")
+        logger.info(f"Loading {MODEL_NAME} model on {device} (backend={MODEL_BACKEND})...")
         try:
-            model_local = SentenceTransformer(MODEL_NAME, device=device)
+            model_local, backend = _build_model(device)
         except RuntimeError as e:
             # CUDA OOM 시 CPU 폴백
             if "CUDA out of memory" in str(e) and device == "cuda":
                 logger.warning("CUDA OOM during load. Falling back to CPU...")
                 device = "cpu"
-                model_local = SentenceTransformer(MODEL_NAME, device=device)
+                model_local, backend = _build_model(device)
             else:
                 raise
 
@@ -79,8 +127,18 @@ def load_model():
             except Exception as _:
                 pass
 
+        # GPU에서는 FP16으로 변환 (CPU는 FP16 연산이 느리므로 FP32 유지)
+        if device == "cuda" and USE_FP16 and backend == "torch":
+            model_local = model_local.half()
+            logger.info("Using FP16 weights on CUDA")
+
+        # 컴파일은 FP16 변환 이후에 (변환된 가중치 기준으로 그래프 생성)
+        if MODEL_BACKEND == "compile" and backend == "torch" and _compile_model(model_local, device):
+            backend = "compile"
+
         model = model_local
         MODEL_DEVICE = device
+        ACTIVE_BACKEND = backend
         logger.info("Model loaded successfully")
         return True
     except Exception as e:
@@ -88,12 +146,76 @@ def load_model():
         MODEL_DEVICE = "unloaded"
         return False
 
+async def _batch_worker():
+    """큐에 쌓인 /embed 요청을 BATCH_WINDOW_MS 동안 모아 한 번의 encode로 처리"""
+    loop = asyncio.get_running_loop()
+    queue = _embed_queue
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + BATCH_WINDOW_MS / 1000.0
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # 이미 취소된 요청(클라이언트 연결 종료)은 건너뜀
+        batch = [(text, fut) for text, fut in batch if not fut.done()]
+        if not batch:
+            continue
+        try:
+            # encode는 블로킹이므로 스레드에서 실행해 이벤트 루프가 다음 요청을 계속 받도록 함
+            embeddings = await asyncio.to_thread(
+                model.encode,
+                [text for text, _ in batch],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                batch_size=len(batch),
+            )
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        for (_, fut), emb in zip(batch, embeddings):
+            if not fut.done():
+                fut.set_result(emb)
+
+
+async def submit_and_wait(text: str):
+    """배치 워커에 텍스트를 넣고 결과 임베딩을 기다림 (워커가 없으면 직접 encode)"""
+    if _embed_queue is None:
+        return await asyncio.to_thread(model.encode, text, normalize_embeddings=True)
+    fut = asyncio.get_running_loop().create_future()
+    await _embed_queue.put((text, fut))
+    return await fut
+
 @app.on_event("startup")
 async def startup_event():
     """서버 시작 시 모델 로드"""
+    global _embed_queue, _batch_task
     success = load_model()
     if not success:
         logger.error("Failed to load model during startup")
+    if BATCH_WINDOW_MS > 0 and BATCH_SIZE > 1:
+        _embed_queue = asyncio.Queue()
+        _batch_task = asyncio.create_task(_batch_worker())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """배치 워커 정리"""
+    global _embed_queue, _batch_task
+    if _batch_task is not None:
+        _batch_task.cancel()
+        try:
+            await _batch_task
+        except asyncio.CancelledError:
+            pass
+    _batch_task = None
+    _embed_queue = None
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -124,7 +246,7 @@ async def get_embedding(request: EmbeddingRequest):
 
     try:
         text = request.text.strip()
-        embedding = model.encode(text, normalize_embeddings=True)
+        embedding = await submit_and_wait(text)
         return EmbeddingResponse(
             embedding=embedding.tolist(),
             model_name=MODEL_NAME,
@@ -137,6 +259,11 @@ async def get_embedding(request: EmbeddingRequest):
             detail=f"Failed to generate embedding: {str(e)}"
         )
 
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    """배치 인코딩 결과를 (N, D) float32 행렬로 반환 (FP16 모델 출력도 float32로)"""
+    embeddings = model.encode(texts, normalize_embeddings=True, batch_size=BATCH_SIZE, convert_to_numpy=True)
+    return np.asarray(embeddings, dtype=np.float32)
+
 @app.post("/embed/batch", response_model=List[EmbeddingResponse])
 async def get_embeddings_batch(texts: List[str]):
     """여러 텍스트를 배치로 임베딩 변환"""
@@ -145,7 +272,13 @@ async def get_embeddings_batch(texts: List[str]):
     if not texts:
         return []
     try:
-        embeddings = model.encode(texts, normalize_embeddings=True, batch_size=BATCH_SIZE)
+        embeddings = await asyncio.to_thread(_encode_batch, texts)
+        if orjson is not None:
+            # orjson이 numpy 행을 직접 직렬화 (tolist + pydantic 검증 생략, 응답 형태는 동일)
+            return ORJSONResponse([
+                {"embedding": emb, "model_name": MODEL_NAME, "text_length": len(txt)}
+                for txt, emb in zip(texts, embeddings)
+            ])
         return [
             EmbeddingResponse(
                 embedding=emb.tolist() if hasattr(emb, 'tolist') else list(emb),
@@ -158,6 +291,26 @@ async def get_embeddings_batch(texts: List[str]):
         logger.error(f"Error generating batch embeddings: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate batch embeddings: {str(e)}")
 
+@app.post("/embed/batch/raw")
+async def get_embeddings_batch_raw(texts: List[str]):
+    """
+    배치 임베딩을 float32 little-endian 바이트로 반환 (JSON 변환 없음)
+    X-Shape 헤더의 "N,D"로 복원: np.frombuffer(body, "<f4").reshape(N, D)
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Please check server logs.")
+    try:
+        embeddings = await asyncio.to_thread(_encode_batch, texts) if texts else np.empty((0, 0), dtype=np.float32)
+        n, d = embeddings.shape if embeddings.ndim == 2 else (0, 0)
+        return Response(
+            content=embeddings.astype("<f4", copy=False).tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Shape": f"{n},{d}", "X-Model-Name": MODEL_NAME},
+        )
+    except Exception as e:
+        logger.error(f"Error generating raw batch embeddings: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate batch embeddings: {str(e)}")
+
 @app.get("/info")
 async def get_server_info():
     return {
@@ -167,10 +320,14 @@ async def get_server_info():
         "model_name": MODEL_NAME if model is not None else "none",
         "device": MODEL_DEVICE if model is not None else "none",
         "batch_size": BATCH_SIZE,
+        "batch_window_ms": BATCH_WINDOW_MS,
+        "fp16": USE_FP16 and MODEL_DEVICE == "cuda" and ACTIVE_BACKEND != "onnx",
+        "backend": ACTIVE_BACKEND,
         "endpoints": [
             "GET /health",
             "POST /embed",
             "POST /embed/batch",
+            "POST /embed/batch/raw",
             "GET /info"
         ]
     }